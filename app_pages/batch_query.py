@@ -1,6 +1,6 @@
 import streamlit as st
 from database_config import get_database_config
-from get_data import get_search_batchs_data, get_device_type_tuple, get_device_tuple
+from get_data import get_search_batchs_page, count_search_batchs, get_device_type_tuple, get_device_tuple
 from clean_data import get_formatted_datetime_df
 from st_aggrid import AgGrid, JsCode, StAggridTheme, GridUpdateMode, DataReturnMode
 import streamlit_antd_components as sac
@@ -8,6 +8,9 @@ import traceback
 import json
 
 
+# 每页批次数，分页在数据库端完成，只拉取当前页
+PAGE_SIZE = 20
+
 def render_batch_table(realtime: bool, database, theme: StAggridTheme):
     key_suffix = 'rt' if realtime else 'his'
     LICENSE_KEY = '[v3][RELEASE][0102]_NDg2Njc4MzY3MDgzNw==16d78ca762fb5d2ff740aed081e2af7b'
@@ -207,16 +210,36 @@ def render_batch_table(realtime: bool, database, theme: StAggridTheme):
                 end_time = st.date_input("**结束日期**", value=None, key=f"end_time_{key_suffix}")
             with cols2[2]:
                 search_button = st.button("查询批次", icon=':material/search_insights:', key=f"search_button_{key_suffix}")
+        # 精确总数需要按查询条件扫描整个批次表，默认不统计，只按游标翻页
+        count_total = st.checkbox("统计总数", value=False, key=f"count_total_{key_suffix}")
+    # 查询条件和翻页游标保存在 session_state 中，翻页重跑时沿用上次查询条件
+    page_state_key = f"batch_page_{key_suffix}"
+    if search_button:
+        st.session_state[page_state_key] = {
+            'filters': {
+                'batch_number': batch_number,
+                'device_id': device_id,
+                'start_time': start_time.strftime('%Y-%m-%d') if start_time else None,
+                'end_time': end_time.strftime('%Y-%m-%d') if end_time else None,
+                'realtime': realtime
+            },
+            'cursors': [None],
+            'count_total': count_total,
+            'total': None
+        }
+    page_state = st.session_state.get(page_state_key)
     with st.container(key=f"batch_container_{key_suffix}"):
-        if search_button:
+        if page_state:
             try:
-                batch_df, device_df = get_search_batchs_data(
+                filters = page_state['filters']
+                cursors = page_state['cursors']
+                if page_state.get('count_total') and page_state['total'] is None:
+                    page_state['total'] = count_search_batchs(database, **filters)
+                batch_df, device_df, next_cursor = get_search_batchs_page(
                     database,
-                    batch_number,
-                    device_id,
-                    start_time.strftime('%Y-%m-%d') if start_time else None,
-                    end_time.strftime('%Y-%m-%d') if end_time else None,
-                    realtime=realtime
+                    **filters,
+                    cursor=cursors[-1],
+                    page_size=PAGE_SIZE
                 )
                 if batch_df.empty:
                     st.info("未查询到批次数据")
@@ -243,8 +266,7 @@ def render_batch_table(realtime: bool, database, theme: StAggridTheme):
                          }
                     ],
                     "rowHeight": 40,
-                    "pagination": True,
-                    "paginationPageSize": 20,
+                    "pagination": False,
                     "cellSelection": True,
                     "defaultColDef": {
                         "sortable": False,
@@ -321,8 +343,27 @@ def render_batch_table(realtime: bool, database, theme: StAggridTheme):
                     update_mode=GridUpdateMode.NO_UPDATE,
                     data_return_mode=DataReturnMode.FILTERED_AND_SORTED,
                     theme=theme if theme else StAggridTheme(base='quartz'),
-                    key=f"aggrid_{key_suffix}"
+                    key=f"aggrid_{key_suffix}_{len(cursors)}"
                 )
+                # 翻页：上一页弹出游标，下一页压入本页最后一条记录作为游标
+                page_index = len(cursors)
+                nav_cols = st.columns([1, 1, 6], vertical_alignment='center')
+                with nav_cols[0]:
+                    st.button("上一页", icon=':material/chevron_left:',
+                              disabled=page_index <= 1,
+                              on_click=cursors.pop,
+                              key=f"prev_page_{key_suffix}")
+                with nav_cols[1]:
+                    st.button("下一页", icon=':material/chevron_right:',
+                              disabled=next_cursor is None,
+                              on_click=cursors.append, args=(next_cursor,),
+                              key=f"next_page_{key_suffix}")
+                with nav_cols[2]:
+                    if page_state['total'] is None:
+                        st.caption(f"第 {page_index} 页")
+                    else:
+                        total_pages = max(1, -(-page_state['total'] // PAGE_SIZE))
+                        st.caption(f"第 {page_index} / {total_pages} 页，共 {page_state['total']} 个批次")
                 
                 # st.dataframe(batch_df, use_container_width=True, hide_index=True)
                 # st.dataframe(device_df, use_container_width=True, hide_index=True)
@@ -1,9 +1,18 @@
 import streamlit as st
 from st_aggrid import AgGrid, GridOptionsBuilder, JsCode, StAggridTheme
 from database_config import get_database_config
-from get_data import get_device_type_tuple, get_device_tuple, get_report_data_df
-from clean_data import get_report_template_dataframe
-from report import get_report
+from get_data import get_device_type_tuple, get_device_tuple, get_report_data_df, get_search_batchs_data, iter_bulk_report_data_df
+from clean_data import DataCleanerFactory, ReportTemplateProcessor, iter_report_records
+from report import ReportGeneratorFactory, get_multi_report_stream, get_report_zip_stream
+from report_service import get_report_service
+from report_cache import get_cached_report
+import streamlit_antd_components as sac
+from tempfile import SpooledTemporaryFile
+from typing import Any, BinaryIO, Iterable, Iterator
+from functools import partial
+import tempfile
+import shutil
+import os
 
 
 # def render_report_sections(report_data):
@@ -242,20 +251,11 @@ def render_report_sections_to_aggrid(report_data):
 
 
 @st.fragment
-def st_generate_report(report_template_df: dict, batch_number, device_name) -> None:
+def st_generate_report(report_data, report_table_name: str, batch_number, device_name) -> None:
     generate_report_button = st.button('生成报表', icon=':material/table_convert:')
     if generate_report_button:
-        # 转换新格式为旧格式以兼容报表生成器
-        legacy_format = {
-            'header': [report_template_df['sections'][0]['data']],  # 报表基本信息
-            'main': [
-                report_template_df['sections'][1]['data'],  # 一次参数设置
-                report_template_df['sections'][2]['data']   # 一次煎煮记录
-            ],
-            'footer': [report_template_df['sections'][3]['data']]   # 汇总信息
-        }
-        
-        batch_report = get_report(legacy_format, 'T_TQ_Batch_Archive', device_name)
+        # 按编译好的模板布局直接由清洗后的报表数据生成，已结束批次优先取磁盘缓存
+        batch_report = get_cached_report(report_data, report_table_name)
         st.success("报表生成成功！")
         st.download_button(
             label='下载报表',
@@ -267,9 +267,10 @@ def st_generate_report(report_template_df: dict, batch_number, device_name) -> N
         )
 
 
-def page():
-    database = get_database_config()
+def render_single_report(database) -> None:
     report_template_df = None
+    report_data = None
+    report_table_name = None
 
     # st.title("报表生成")
     # st.markdown("---")
@@ -317,7 +318,8 @@ def page():
                 if report_data_df is None or report_data_df.empty:
                     st.info("未找到相关报表数据")
                     return
-                report_template_df = get_report_template_dataframe(report_table_name, report_data_df)
+                report_data = DataCleanerFactory.clean_dataframe(report_table_name, report_data_df)
+                report_template_df = ReportTemplateProcessor.convert_to_template_df(report_data, report_table_name)
                 if report_template_df is None or not report_template_df:
                     st.info("报表数据为空")
                     return
@@ -329,7 +331,143 @@ def page():
     
     if report_template_df:
         with st.container(border=True):
-            st_generate_report(report_template_df, batch_number, device_name)
+            st_generate_report(report_data, report_table_name, batch_number, device_name)
+
+
+# 跳过没有报表生成器的归档表（如双效浓缩器），避免导出中途报错
+def _iter_supported_records(records: Iterable[tuple[str, Any]], unsupported: list) -> Iterator[tuple[str, Any]]:
+    for table_name, record in records:
+        if table_name not in ReportGeneratorFactory.GENERATOR_MAPPING:
+            unsupported.append(record)
+            continue
+        yield table_name, record
+
+# 生成结果先落到磁盘临时文件，下载按钮直接读取文件，页面不再额外保留一份完整内容
+def _to_download_file(output: SpooledTemporaryFile) -> BinaryIO:
+    with output, tempfile.NamedTemporaryFile(suffix='.download', delete=False) as f:
+        shutil.copyfileobj(output, f)
+    return open(f.name, 'rb')
+
+
+# 批量导出：按时间范围和设备筛选已完成的设备批次，生成一个多工作表工作簿或 ZIP 压缩包
+@st.fragment
+def render_bulk_export(database) -> None:
+    with st.container(border=True):
+        cols1 = st.columns(3, vertical_alignment='bottom')
+        cols2 = st.columns(3, vertical_alignment='bottom')
+        with cols1[0]:
+            device_type_tuples = get_device_type_tuple(database)
+            device_type = st.selectbox(
+                "**设备类型**",
+                options=device_type_tuples,
+                format_func=lambda x: x[1],
+                index=None,
+                accept_new_options=False,
+                key="bulk_device_type"
+            )
+            device_type_id = device_type[0] if device_type else 0
+        with cols1[1]:
+            device_tuples = get_device_tuple(database, device_type_id)
+            device_selects = st.multiselect(
+                '**选择设备**',
+                options=device_tuples if device_tuples else [],
+                format_func=lambda x: x[1],
+                placeholder="不选则导出该类型全部设备",
+                key="bulk_devices"
+            )
+        with cols1[2]:
+            export_mode = st.radio(
+                "**导出方式**",
+                options=['单个工作簿', 'ZIP压缩包'],
+                horizontal=True,
+                key="bulk_export_mode"
+            )
+        with cols2[0]:
+            start_time = st.date_input("**开始日期**", value=None, key="bulk_start_time")
+        with cols2[1]:
+            end_time = st.date_input("**结束日期**", value=None, key="bulk_end_time")
+        with cols2[2]:
+            export_button = st.button("批量导出", icon=':material/file_copy:', key="bulk_export_button")
+
+    if not export_button:
+        return
+    if not device_type:
+        st.warning("未选择设备类型")
+        return
+    if not start_time or not end_time:
+        st.warning("未选择日期范围")
+        return
+    device_ids = {d[0] for d in device_selects} if device_selects else {d[0] for d in device_tuples}
+    with st.spinner("正在生成报表..."):
+        _, device_df = get_search_batchs_data(
+            database, '', 0,
+            start_time.strftime('%Y-%m-%d'),
+            end_time.strftime('%Y-%m-%d'),
+            realtime=False,
+            normalized=True
+        )
+        if device_df.empty:
+            st.info("未查询到批次数据")
+            return
+        device_df = device_df[device_df['device_id'].isin(device_ids)]
+        pairs = list(zip(device_df['batch_number'], device_df['device_id'].astype(int)))
+        if not pairs:
+            st.info("所选设备在该时间范围内没有批次")
+            return
+        missing = []
+        unsupported = []
+        failed = []
+        records = _iter_supported_records(iter_report_records(iter_bulk_report_data_df(database, pairs), missing), unsupported)
+        try:
+            if export_mode == '单个工作簿':
+                output = get_multi_report_stream(records)
+                file_name = f"Batch_Rpt_{start_time:%Y%m%d}_{end_time:%Y%m%d}.xlsx"
+                mime = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+            else:
+                # 每个设备批次独立成文件，交给进程池并发渲染
+                output = get_report_zip_stream(records, render_many=partial(get_report_service().render_many, failed=failed))
+                file_name = f"Batch_Rpt_{start_time:%Y%m%d}_{end_time:%Y%m%d}.zip"
+                mime = 'application/zip'
+            download_file = _to_download_file(output)
+        except (ValueError, TimeoutError, OSError) as e:
+            st.error(f"批量导出失败: {e}")
+            return
+    count = len(pairs) - len(missing) - len(unsupported) - len(failed)
+    st.success(f"已生成 {count} 个设备批次报表")
+    if missing:
+        st.warning(f"{len(missing)} 个设备批次没有报表数据，已跳过")
+    if unsupported:
+        st.warning(f"{len(unsupported)} 个设备批次的设备类型暂不支持生成报表，已跳过")
+    if failed:
+        st.warning(f"{len(failed)} 个设备批次报表生成失败（{failed[0][1]} 等），已跳过")
+    try:
+        st.download_button(
+            label='下载报表',
+            data=download_file,
+            file_name=file_name,
+            on_click='ignore',
+            icon=':material/download:',
+            mime=mime
+        )
+    finally:
+        download_file.close()
+        os.unlink(download_file.name)
+
+
+def page():
+    database = get_database_config()
+
+    select = sac.tabs([sac.TabsItem(label='单批次报表'), sac.TabsItem(label='批量导出')],
+                      size='md', variant='outline',
+                      align='start', color='#2E5FF3',
+                      return_index=True
+                    )
+
+    if select == 0:
+        render_single_report(database)
+
+    if select == 1:
+        render_bulk_export(database)
 
     # 页脚
     st.markdown("---")
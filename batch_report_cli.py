@@ -0,0 +1,135 @@
+"""
+批次报表批量生成命令行工具，不依赖 Streamlit，可用于定时任务
+
+示例:
+    python batch_report_cli.py --start 2025-09-01 --end 2025-09-30 --device-type 1 --output reports/
+    python batch_report_cli.py --start 2025-09-01 --end 2025-09-30 --device-type 1 --device-ids 3 5 --output reports.zip
+"""
+from datetime import date
+from pathlib import Path
+import numpy as np
+import argparse
+import shutil
+import time
+import sys
+
+from mssql_config import load_database_config, DatabaseConfig
+from get_data import get_device_tuple, get_search_batchs_data, iter_bulk_report_data_df
+from clean_data import iter_report_records
+from report import get_report_zip_stream, make_report_file_name
+from report_service import ReportRenderService
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="按时间范围和设备批量生成已完成批次的报表")
+    parser.add_argument('--start', required=True, type=date.fromisoformat, help="开始日期，如 2025-09-01")
+    parser.add_argument('--end', required=True, type=date.fromisoformat, help="结束日期，如 2025-09-30")
+    parser.add_argument('--device-type', required=True, type=int, help="设备类型 ID")
+    parser.add_argument('--device-ids', nargs='*', type=int, default=[], help="设备 ID，不指定则导出该类型全部设备")
+    parser.add_argument('--output', required=True, type=Path, help="输出目录，以 .zip 结尾时输出为压缩包")
+    parser.add_argument('--workers', type=int, default=None, help="渲染进程数，默认 CPU 核数减一")
+    parser.add_argument('--timeout', type=float, default=60, help="单份报表渲染超时（秒）")
+    parser.add_argument('--secrets', type=Path, default=None, help="数据库配置文件，默认 .streamlit/secrets.toml")
+    args = parser.parse_args(argv)
+    if args.start > args.end:
+        parser.error("开始日期不能晚于结束日期")
+    return args
+
+def collect_pairs(database: DatabaseConfig, start: date, end: date, device_type_id: int,
+                  device_ids: list[int]) -> list[tuple[str, int]]:
+    """
+    查询时间范围内已完成的设备批次，返回 (批号, 设备ID) 列表
+    """
+    allowed = {d[0] for d in get_device_tuple(database, device_type_id)}
+    if device_ids:
+        unknown = set(device_ids) - allowed
+        if unknown:
+            print(f"以下设备不属于该设备类型，已忽略: {sorted(unknown)}")
+        allowed &= set(device_ids)
+    if not allowed:
+        return []
+    _, device_df = get_search_batchs_data(
+        database, '', 0,
+        start.strftime('%Y-%m-%d'),
+        end.strftime('%Y-%m-%d'),
+        realtime=False,
+        normalized=True
+    )
+    if device_df.empty:
+        return []
+    device_df = device_df[device_df['device_id'].isin(allowed)]
+    return list(zip(device_df['batch_number'], device_df['device_id'].astype(int)))
+
+def render_to_directory(service: ReportRenderService, records, output_dir: Path, failed: list) -> int:
+    output_dir.mkdir(parents=True, exist_ok=True)
+    used_names: set[str] = set()
+    count = 0
+    for record, content in service.render_many(records, failed=failed):
+        (output_dir / make_report_file_name(record, used_names)).write_bytes(content)
+        count += 1
+    return count
+
+def render_to_zip(service: ReportRenderService, records, output_file: Path, failed: list) -> int:
+    output_file.parent.mkdir(parents=True, exist_ok=True)
+    count = 0
+
+    # 统计实际写入的报表数
+    def render_many(items):
+        nonlocal count
+        for item in service.render_many(items, failed=failed):
+            count += 1
+            yield item
+
+    with get_report_zip_stream(records, render_many=render_many) as output, open(output_file, 'wb') as f:
+        shutil.copyfileobj(output, f)
+    return count
+
+def print_summary(count: int, missing: int, failed: list, query_seconds: float, total_seconds: float,
+                  service: ReportRenderService) -> None:
+    print("=" * 40)
+    print(f"生成报表: {count} 份，无报表数据跳过: {missing} 份，生成失败: {len(failed)} 份")
+    for record, reason in failed:
+        print(f"  {getattr(record, 'batch_number', '')} {getattr(record, 'device_name', '')}: {reason}")
+    print(f"批次查询耗时: {query_seconds:.2f}s，总耗时: {total_seconds:.2f}s")
+    if count and total_seconds > 0:
+        print(f"吞吐量: {count / total_seconds:.2f} 份/秒")
+    if service.latencies:
+        latencies = np.fromiter(service.latencies, dtype=np.float64)
+        p50, p95 = np.percentile(latencies, [50, 95])
+        print(f"单份耗时（提交到完成）: p50 {p50 * 1000:.0f}ms，p95 {p95 * 1000:.0f}ms，最大 {latencies.max() * 1000:.0f}ms")
+    if service.fallback_count:
+        print(f"进程池不可用、退回当前进程渲染: {service.fallback_count} 份")
+
+def main(argv: list[str] | None = None) -> int:
+    args = parse_args(argv)
+    try:
+        database = load_database_config(args.secrets)
+        started = time.perf_counter()
+        pairs = collect_pairs(database, args.start, args.end, args.device_type, args.device_ids)
+        query_seconds = time.perf_counter() - started
+        if not pairs:
+            print("所选设备在该时间范围内没有批次")
+            return 0
+        print(f"共 {len(pairs)} 个设备批次，开始生成报表...")
+
+        service = ReportRenderService(max_workers=args.workers, task_timeout=args.timeout)
+        missing = []
+        failed = []
+        records = iter_report_records(iter_bulk_report_data_df(database, pairs), missing)
+        try:
+            if args.output.suffix.lower() == '.zip':
+                count = render_to_zip(service, records, args.output, failed)
+            else:
+                count = render_to_directory(service, records, args.output, failed)
+        finally:
+            service.shutdown()
+        print_summary(count, len(missing), failed, query_seconds, time.perf_counter() - started, service)
+        print(f"报表已输出到: {args.output}")
+        return 1 if failed else 0
+    except (ValueError, TimeoutError, OSError) as e:
+        print(f"报表生成失败: {e}", file=sys.stderr)
+        return 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,10 +1,16 @@
 import pandas as pd
-from dataclasses import dataclass
-from typing import Optional, Dict, Any, Protocol, runtime_checkable
-from datetime import datetime
+import numpy as np
+from dataclasses import dataclass, fields
+from functools import lru_cache
+from sqlalchemy import DateTime, Integer, Numeric, String
+from models import TBatch, TDeviceInfo, get_archive_table_class
+from typing import Optional, Dict, Any, Iterable, Iterator, Protocol, runtime_checkable
+from report_layout import get_layout_plan, render_section_rows, column_letters
 
 @runtime_checkable
 class BaseReportDataProtocol(Protocol):
+    # 协议类不带 __dict__，报表数据类才能真正使用 __slots__
+    __slots__ = ()
     # 通用基本参数
     product_name: Optional[str]
     batch_quantity: Optional[float]
@@ -18,6 +24,8 @@ class BaseReportDataProtocol(Protocol):
 # 提取罐报表数据类型协议
 @runtime_checkable
 class TQReportDataProtocol(BaseReportDataProtocol, Protocol):
+    # 协议类不带 __dict__，报表数据类才能真正使用 __slots__
+    __slots__ = ()
     # 一次煎煮设定参数
     p1_up_temp_set: Optional[float]
     p1_up_temp_press_set: Optional[float]
@@ -48,10 +56,11 @@ class TQReportDataProtocol(BaseReportDataProtocol, Protocol):
 # 双效浓缩器报表数据类型协议
 @runtime_checkable
 class SXReportDataProtocol(BaseReportDataProtocol, Protocol):
+    __slots__ = ()
     # 双效浓缩器特有参数可以在这里定义
-    pass
 
-@dataclass
+# 报表数据使用 __slots__，单个对象不再携带 __dict__
+@dataclass(slots=True)
 class BaseReportData(BaseReportDataProtocol):
     product_name: Optional[str] = ''
     batch_quantity: Optional[float] = None
@@ -62,7 +71,7 @@ class BaseReportData(BaseReportDataProtocol):
     device_batch_start_time: Optional[str] = None
     device_batch_end_time: Optional[str] = None
 
-@dataclass
+@dataclass(slots=True)
 class TQReportData(BaseReportData, TQReportDataProtocol):
     # 一次煎煮设定参数
     p1_up_temp_set: Optional[float] = 0.0
@@ -91,7 +100,7 @@ class TQReportData(BaseReportData, TQReportDataProtocol):
     p1_start_time: Optional[str] = None
     p1_end_time: Optional[str] = None
 
-@dataclass
+@dataclass(slots=True)
 class SXReportData(BaseReportData, SXReportDataProtocol):
     # 双效浓缩器特有参数可以在这里定义
     pass
@@ -158,60 +167,261 @@ class DataCleaner:
         )
         return df
 
+# 列式数据清洗工具，与 DataCleaner 的判空、去千分位、时间格式规则一致，但整列一次处理
+class ColumnCleaner:
+    DATETIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+    # 公共判空，返回布尔掩码
+    @staticmethod
+    def null_mask(s: pd.Series) -> pd.Series:
+        mask = s.isna()
+        if s.dtype == object or pd.api.types.is_string_dtype(s.dtype):
+            is_str = s.map(type) == str
+            if is_str.any():
+                literals = s[is_str].str.strip().str.lower().isin(DataCleaner._NULL_LITERALS)
+                mask = mask | literals.reindex(s.index, fill_value=False)
+        return mask
+
+    # 数值，空值为 NaN
+    @staticmethod
+    def clean_float_series(s: pd.Series) -> pd.Series:
+        if pd.api.types.is_bool_dtype(s.dtype):
+            return pd.Series(float('nan'), index=s.index)
+        if pd.api.types.is_numeric_dtype(s.dtype):
+            return s.astype("float64")
+        null = ColumnCleaner.null_mask(s)
+        values = s.where(~null)
+        out = pd.to_numeric(values, errors="coerce").astype("float64")
+        # 直接转换失败的字符串，去掉千分位和首尾空白后再转一次
+        retry = out.isna() & ~null & (values.map(type) == str)
+        if retry.any():
+            out[retry] = pd.to_numeric(
+                values[retry].str.replace(",", "", regex=False).str.strip(), errors="coerce"
+            )
+        return out
+
+    # 整数，非整数值视为空，返回可空整数类型
+    @staticmethod
+    def clean_int_series(s: pd.Series) -> pd.Series:
+        f = ColumnCleaner.clean_float_series(s)
+        f = f.where(f == f.round())
+        return f.astype("Int64")
+
+    # 时间，格式化为字符串，空值为 None
+    @staticmethod
+    def clean_datetime_series(s: pd.Series) -> pd.Series:
+        if pd.api.types.is_datetime64_any_dtype(s.dtype):
+            ts = s
+        else:
+            values = s.where(~ColumnCleaner.null_mask(s))
+            ts = pd.to_datetime(values, errors="coerce", format="mixed")
+        out = ts.dt.strftime(ColumnCleaner.DATETIME_FORMAT).astype(object)
+        return out.where(ts.notna(), None)
+
+    # 字符串，去除首尾空白，空值为 None
+    @staticmethod
+    def clean_str_series(s: pd.Series) -> pd.Series:
+        null = ColumnCleaner.null_mask(s)
+        out = s.astype(str).str.strip().astype(object)
+        return out.where(~null, None)
+
+    CONVERTERS = {
+        'float': clean_float_series,
+        'int': clean_int_series,
+        'datetime': clean_datetime_series,
+        'str': clean_str_series,
+    }
+
+    @classmethod
+    def clean_frame(cls, raw_df: pd.DataFrame, column_types: dict[str, str]) -> pd.DataFrame:
+        """
+        按列类型整表清洗
+
+        Args:
+            raw_df: 原始数据
+            column_types: 列名 → 类型（'float' / 'int' / 'datetime' / 'str'），缺失的列按全空处理
+        """
+        cleaned = {}
+        for column, kind in column_types.items():
+            converter = cls.CONVERTERS[kind]
+            source = raw_df[column] if column in raw_df.columns else pd.Series(None, index=raw_df.index, dtype=object)
+            cleaned[column] = converter(source)
+        return pd.DataFrame(cleaned, index=raw_df.index)
+
+    # 转为字典列表，空值统一为 None
+    @staticmethod
+    def to_records(cleaned_df: pd.DataFrame) -> list[dict[str, Any]]:
+        obj = cleaned_df.astype(object)
+        return obj.where(cleaned_df.notna(), None).to_dict("records")
+
+# 列式报表数据集合：每个字段一列 NumPy 数组加空值掩码，批量导出、跨批次对比时代替大量报表数据对象
+class ReportDataColumns:
+    __slots__ = ('record_class', 'column_types', 'values', 'null_masks', '_length')
+
+    def __init__(self, record_class: type, column_types: dict[str, str],
+                 values: dict[str, np.ndarray], null_masks: dict[str, np.ndarray], length: int):
+        self.record_class = record_class
+        self.column_types = column_types
+        self.values = values
+        self.null_masks = null_masks
+        self._length = length
+
+    # 由清洗后的 DataFrame 构建，数值列存为定长数组，时间列存为 datetime64[s]
+    @classmethod
+    def from_frame(cls, cleaned_df: pd.DataFrame, column_types: dict[str, str], record_class: type) -> 'ReportDataColumns':
+        record_fields = set(f.name for f in fields(record_class))
+        types = {c: k for c, k in column_types.items() if c in record_fields and c in cleaned_df.columns}
+        values: dict[str, np.ndarray] = {}
+        null_masks: dict[str, np.ndarray] = {}
+        for column, kind in types.items():
+            series = cleaned_df[column]
+            mask = series.isna().to_numpy()
+            if kind == 'float':
+                values[column] = series.to_numpy(dtype='float64', na_value=np.nan)
+            elif kind == 'int':
+                values[column] = series.to_numpy(dtype='int64', na_value=0)
+            elif kind == 'datetime':
+                ts = pd.to_datetime(series, format=ColumnCleaner.DATETIME_FORMAT)
+                values[column] = ts.to_numpy(dtype='datetime64[s]')
+            else:
+                values[column] = series.to_numpy(dtype=object)
+            null_masks[column] = mask
+        return cls(record_class, types, values, null_masks, len(cleaned_df))
+
+    def __len__(self) -> int:
+        return self._length
+
+    def _value(self, column: str, i: int) -> Any:
+        if self.null_masks[column][i]:
+            return None
+        v = self.values[column][i]
+        kind = self.column_types[column]
+        if kind == 'float':
+            return float(v)
+        if kind == 'int':
+            return int(v)
+        if kind == 'datetime':
+            return str(v).replace('T', ' ')
+        return v
+
+    # 按需生成单个报表数据对象，满足报表模板处理器的属性约定
+    def __getitem__(self, i: int):
+        if i < 0:
+            i += self._length
+        if not 0 <= i < self._length:
+            raise IndexError(i)
+        return self.record_class(**{column: self._value(column, i) for column in self.column_types})
+
+    def __iter__(self):
+        for i in range(self._length):
+            yield self[i]
+
+    # 单列数值与空值掩码，便于跨批次统计
+    def column(self, name: str) -> tuple[np.ndarray, np.ndarray]:
+        return self.values[name], self.null_masks[name]
+
+    @property
+    def nbytes(self) -> int:
+        return sum(v.nbytes for v in self.values.values()) + sum(m.nbytes for m in self.null_masks.values())
+
+# 基于 ORM 模型的数据清洗：按归档表字段类型自动生成列转换规则，新增设备类型无需手写字段清单
+class SchemaDataCleaner:
+    # 报表查询中关联出的批次、设备字段
+    BASE_COLUMNS = (
+        TBatch.__table__.c.product_name,
+        TBatch.__table__.c.batch_quantity,
+        TBatch.__table__.c.batch_number,
+        TDeviceInfo.__table__.c.device_name,
+        TDeviceInfo.__table__.c.device_id,
+    )
+
+    @staticmethod
+    def _column_kind(column) -> str | None:
+        column_type = column.type
+        if isinstance(column_type, DateTime):
+            return 'datetime'
+        if isinstance(column_type, Integer):
+            return 'int'
+        if isinstance(column_type, Numeric):
+            return 'float'
+        if isinstance(column_type, String):
+            return 'str'
+        return None
+
+    # 列名 → 类型，按归档表缓存，只生成一次
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def get_column_types(table_name: str) -> dict[str, str]:
+        table = get_archive_table_class(table_name).__table__
+        column_types: dict[str, str] = {}
+        for column in (*SchemaDataCleaner.BASE_COLUMNS, *table.columns):
+            kind = SchemaDataCleaner._column_kind(column)
+            if kind and column.name not in column_types:
+                column_types[column.name] = kind
+        return column_types
+
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def _record_fields(record_class: type) -> tuple[str, ...]:
+        return tuple(f.name for f in fields(record_class))
+
+    @classmethod
+    def clean_frame(cls, table_name: str, raw_df: pd.DataFrame) -> pd.DataFrame:
+        return ColumnCleaner.clean_frame(raw_df, cls.get_column_types(table_name))
+
+    # 整表清洗并转为报表数据对象，只保留报表数据类中定义的字段
+    @classmethod
+    def clean_rows(cls, table_name: str, raw_df: pd.DataFrame, record_class: type) -> list:
+        record_fields = cls._record_fields(record_class)
+        records = ColumnCleaner.to_records(cls.clean_frame(table_name, raw_df))
+        return [record_class(**{k: record[k] for k in record_fields if k in record}) for record in records]
+
+    # 整表清洗为列式集合
+    @classmethod
+    def clean_columns(cls, table_name: str, raw_df: pd.DataFrame, record_class: type) -> ReportDataColumns:
+        column_types = cls.get_column_types(table_name)
+        return ReportDataColumns.from_frame(cls.clean_frame(table_name, raw_df), column_types, record_class)
+
 # 提取罐数据清洗
 class TQDataCleaner:
+    TABLE_NAME = 't_tq_batch_archive'
+
+    # 整表清洗，每行一个报表数据
     @staticmethod
-    def clean_dataframe(raw_df: pd.DataFrame) -> TQReportData:
+    def clean_rows(raw_df: pd.DataFrame) -> list[TQReportData]:
         if raw_df.empty:
             raise ValueError('提取罐报表数据为空！')
-        data_dict = raw_df.iloc[0].to_dict()
-        return TQReportData(
-            product_name = DataCleaner.clean_str_value(data_dict.get('product_name')),
-            batch_quantity = DataCleaner.clean_float_value(data_dict.get('batch_quantity')),
-            batch_number = DataCleaner.clean_str_value(data_dict.get('batch_number')),
-            device_batch_id = int(data_dict.get('device_batch_id', 0)),
-            device_name = DataCleaner.clean_str_value(data_dict.get('device_name', '')),
-            device_id = int(data_dict.get('device_id', 0)),
-            device_batch_start_time = DataCleaner.clean_datetime_value(data_dict.get('device_batch_start_time')),
-            device_batch_end_time = DataCleaner.clean_datetime_value(data_dict.get('device_batch_end_time')),
-
-            # 一次煎煮设定参数
-            p1_up_temp_set = DataCleaner.clean_float_value(data_dict.get('p1_up_temp_set')),
-            p1_up_temp_press_set = DataCleaner.clean_float_value(data_dict.get('p1_up_temp_press_set')),
-            p1_hold_temp_set = DataCleaner.clean_float_value(data_dict.get('p1_hold_temp_set')),
-            p1_hold_temp_press_set = DataCleaner.clean_float_value(data_dict.get('p1_hold_temp_press_set')),
-            p1_hold_temp_time_set = DataCleaner.clean_float_value(data_dict.get('p1_hold_temp_time_set')),
-            p1_solvent_num_set = DataCleaner.clean_float_value(data_dict.get('p1_solvent_num_set')),
-            # 一次煎煮升温
-            p1_up_temp_start_time = DataCleaner.clean_datetime_value(data_dict.get('p1_up_temp_start_time')),
-            p1_up_temp_end_time = DataCleaner.clean_datetime_value(data_dict.get('p1_up_temp_end_time')),
-            p1_up_temp_min_press = DataCleaner.clean_float_value(data_dict.get('p1_up_temp_min_press')),
-            p1_up_temp_max_press = DataCleaner.clean_float_value(data_dict.get('p1_up_temp_max_press')),
-            # 一次煎煮保温
-            p1_hold_temp_start_time = DataCleaner.clean_datetime_value(data_dict.get('p1_hold_temp_start_time')),
-            p1_hold_temp_end_time = DataCleaner.clean_datetime_value(data_dict.get('p1_hold_temp_end_time')),
-            p1_hold_temp_min_press = DataCleaner.clean_float_value(data_dict.get('p1_hold_temp_min_press')),
-            p1_hold_temp_max_press = DataCleaner.clean_float_value(data_dict.get('p1_hold_temp_max_press')),
-            p1_hold_temp_time = DataCleaner.clean_float_value(data_dict.get('p1_hold_temp_time')),
-            p1_hold_temp_min_temp = DataCleaner.clean_float_value(data_dict.get('p1_hold_temp_min_temp')),
-            p1_hold_temp_max_temp = DataCleaner.clean_float_value(data_dict.get('p1_hold_temp_max_temp')),
-            # 一次煎煮溶媒和出液
-            p1_solvent_num = DataCleaner.clean_float_value(data_dict.get('p1_solvent_num')),
-            p1_out_num = DataCleaner.clean_float_value(data_dict.get('p1_out_num')),
-            # 一次煎煮整体时间
-            p1_start_time = DataCleaner.clean_datetime_value(data_dict.get('p1_start_time')),
-            p1_end_time = DataCleaner.clean_datetime_value(data_dict.get('p1_end_time'))
-        )
-    
+        return SchemaDataCleaner.clean_rows(TQDataCleaner.TABLE_NAME, raw_df, TQReportData)
+
+    @staticmethod
+    def clean_columns(raw_df: pd.DataFrame) -> ReportDataColumns:
+        if raw_df.empty:
+            raise ValueError('提取罐报表数据为空！')
+        return SchemaDataCleaner.clean_columns(TQDataCleaner.TABLE_NAME, raw_df, TQReportData)
+
+    @staticmethod
+    def clean_dataframe(raw_df: pd.DataFrame) -> TQReportData:
+        return TQDataCleaner.clean_rows(raw_df.iloc[:1])[0]
+
 # 双效浓缩器数据清洗
 class SXDataCleaner:
+    TABLE_NAME = 't_sx_batch_archive'
+
     @staticmethod
-    def clean_dataframe(raw_df: pd.DataFrame) -> SXReportData:
+    def clean_rows(raw_df: pd.DataFrame) -> list[SXReportData]:
         if raw_df.empty:
             raise ValueError('双效浓缩器报表数据为空！')
-        data_dict = raw_df.iloc[0].to_dict()
-        # 添加双效浓缩器报表数据
-        return SXReportData()
+        return SchemaDataCleaner.clean_rows(SXDataCleaner.TABLE_NAME, raw_df, SXReportData)
+
+    @staticmethod
+    def clean_columns(raw_df: pd.DataFrame) -> ReportDataColumns:
+        if raw_df.empty:
+            raise ValueError('双效浓缩器报表数据为空！')
+        return SchemaDataCleaner.clean_columns(SXDataCleaner.TABLE_NAME, raw_df, SXReportData)
+
+    @staticmethod
+    def clean_dataframe(raw_df: pd.DataFrame) -> SXReportData:
+        return SXDataCleaner.clean_rows(raw_df.iloc[:1])[0]
 
 class DataCleanerFactory:
     CLEANER_MAPPING: Dict[str, type] = {
@@ -236,120 +446,24 @@ class DataCleanerFactory:
         return cleaner.clean_dataframe(raw_df)
 
 class TQReportTemplateProcessor:
+    TABLE_NAME = 't_tq_batch_archive'
+
+    # 页面预览仍需要 DataFrame，布局统一来自编译好的模板计划
     @staticmethod
     def create_report_template_dataframe(data: TQReportData) -> dict[str, Any]:
         if not isinstance(data, TQReportData):
             raise ValueError("设备类型不匹配，必须是提取罐类型")
-        header_rows = [
-            {
-                'A': '品名',
-                'B': data.product_name,
-                'C': '批量',
-                'D': data.batch_quantity,
-                'E': '批号',
-                'F': data.batch_number,
-            },
-            {
-                'A': '设备名称',
-                'B': data.device_name,
-                'C': '设备编号',
-                'D': data.device_id
-            },
-            {
-                'A': '开始时间',
-                'B': data.device_batch_start_time,
-                'C': '结束时间',
-                'D': data.device_batch_end_time
-            }
-        ]
-        p1_set_rows = [
-            {
-                'A': '升温压力设定',
-                'B': data.p1_up_temp_press_set,
-                'C': '保温压力设定',
-                'D': data.p1_hold_temp_press_set,
-                'E': '加溶媒量',
-                'F': data.p1_solvent_num_set
-            },
-            {
-                'A': '升温温度设定',
-                'B': data.p1_up_temp_set,
-                'C': '保温温度设定',
-                'D': data.p1_hold_temp_set,
-                'E': '保温时间设定',
-                'F': data.p1_hold_temp_time_set
-            }
-        ]
-        p1_record_rows = [
-            {
-                'A': '升温开始时间',
-                'B': data.p1_up_temp_start_time,
-                'C': '升温结束时间',
-                'D': data.p1_up_temp_end_time,
-                'E': '加溶媒量',
-                'F': data.p1_solvent_num
-            },
-            {
-                'A': '保温开始时间',
-                'B': data.p1_hold_temp_start_time,
-                'C': '保温结束时间',
-                'D': data.p1_hold_temp_end_time,
-                'E': '保温时间',
-                'F': data.p1_hold_temp_time
-            },
-            {
-                'A': '升温最低压力',
-                'B': data.p1_up_temp_min_press,
-                'C': '保温最低压力',
-                'D': data.p1_hold_temp_min_press,
-                'E': '保温最低温度',
-                'F': data.p1_hold_temp_min_temp
-            },
-            {
-                'A': '升温最高压力',
-                'B': data.p1_up_temp_max_press,
-                'C': '保温最高压力',
-                'D': data.p1_hold_temp_max_press,
-                'E': '保温最高温度',
-                'F': data.p1_hold_temp_max_temp
-            },
-            {
-                'A': '出液量',
-                'B': data.p1_out_num
-            }
-        ]
-        footer_rows = [
-            {
-                'A': '操作人',
-                'B': '',
-                'C': '复核人',
-                'D': '',
-                'E': '报表生成时间',
-                'F': datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            }
-        ]
+        plan = get_layout_plan(TQReportTemplateProcessor.TABLE_NAME, TQReportData)
+        dynamic_values: dict[str, str] = {}
+        sections = []
+        for section in plan.sections:
+            rows = render_section_rows(section, data, dynamic_values)
+            sections.append({
+                'title': section.title,
+                'data': pd.DataFrame(rows, columns=column_letters(section.column_count))
+            })
         # 返回标准化的数据结构
-        template_df = {
-            'sections': [
-                {
-                    'title': '基本信息',
-                    'data': pd.DataFrame(header_rows).fillna('').astype(str)
-                },
-                {
-                    'title': '一次参数设置',
-                    'data': pd.DataFrame(p1_set_rows).fillna('').astype(str)
-                },
-                {
-                    'title': '一次煎煮记录',
-                    'data': pd.DataFrame(p1_record_rows).fillna('').astype(str)
-                },
-                {
-                    'title': '其他信息',
-                    'data': pd.DataFrame(footer_rows).fillna('').astype(str)
-                }
-            ]
-        }
-        return template_df
+        return {'sections': sections}
 
 class SXReportTemplateProcessor:
     @staticmethod
@@ -387,3 +501,18 @@ def get_report_template_dataframe(table_name: str, raw_df: pd.DataFrame) -> dict
 
 def get_formatted_datetime_df(df: pd.DataFrame) -> pd.DataFrame:
     return DataCleaner.format_datetime_value(df)
+
+# 批量清洗 get_data.iter_bulk_report_data_df 的结果，逐个产出 (归档表名, 报表数据)
+def iter_report_records(report_frames: Iterable[tuple[tuple[str, int], str | None, pd.DataFrame]],
+                        missing: list[tuple[str, int]] | None = None) -> Iterator[tuple[str, Any]]:
+    """
+    Args:
+        report_frames: ((batch_number, device_id), 归档表名, 报表数据) 迭代器
+        missing: 传入列表时收集没有报表数据的 (batch_number, device_id)
+    """
+    for pair, table_name, raw_df in report_frames:
+        if not table_name or raw_df.empty:
+            if missing is not None:
+                missing.append(pair)
+            continue
+        yield table_name, DataCleanerFactory.clean_dataframe(table_name, raw_df)
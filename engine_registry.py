@@ -0,0 +1,75 @@
+from sqlalchemy import create_engine, event, Engine
+import threading
+import atexit
+
+
+# 进程级引擎注册表：相同连接参数共享同一个 Engine（及其连接池），
+# 避免每次查询都重新建池、重新登录数据库
+_engines: dict[tuple, Engine] = {}
+_counters: dict[tuple, dict[str, int]] = {}
+_lock = threading.Lock()
+
+
+def _make_key(db_url: str, engine_kwargs: dict) -> tuple:
+    return (db_url, tuple(sorted((k, repr(v)) for k, v in engine_kwargs.items())))
+
+# 注册连接池事件，累计签出/签入/新建连接次数以及峰值溢出数
+def _register_pool_counters(key: tuple, engine: Engine) -> None:
+    counters = {"connects": 0, "checkouts": 0, "checkins": 0, "max_overflow_seen": 0}
+    _counters[key] = counters
+
+    @event.listens_for(engine, "connect")
+    def _on_connect(dbapi_conn, conn_record):
+        counters["connects"] += 1
+
+    @event.listens_for(engine, "checkout")
+    def _on_checkout(dbapi_conn, conn_record, conn_proxy):
+        counters["checkouts"] += 1
+        overflow = getattr(engine.pool, "overflow", None)
+        if callable(overflow):
+            counters["max_overflow_seen"] = max(counters["max_overflow_seen"], overflow())
+
+    @event.listens_for(engine, "checkin")
+    def _on_checkin(dbapi_conn, conn_record):
+        counters["checkins"] += 1
+
+# 获取共享引擎，首次调用时才创建
+def get_shared_engine(db_url: str, **engine_kwargs) -> Engine:
+    key = _make_key(db_url, engine_kwargs)
+    engine = _engines.get(key)
+    if engine is not None:
+        return engine
+    with _lock:
+        engine = _engines.get(key)
+        if engine is None:
+            engine = create_engine(db_url, **engine_kwargs)
+            _register_pool_counters(key, engine)
+            _engines[key] = engine
+    return engine
+
+# 连接池状态，供监控页面或日志使用
+def get_pool_stats() -> list[dict]:
+    stats = []
+    with _lock:
+        items = list(_engines.items())
+    for key, engine in items:
+        pool = engine.pool
+        stat = {"url": engine.url.render_as_string(hide_password=True)}
+        for name in ("size", "checkedout", "checkedin", "overflow"):
+            method = getattr(pool, name, None)
+            if callable(method):
+                stat[name] = method()
+        stat.update(_counters.get(key, {}))
+        stats.append(stat)
+    return stats
+
+# 释放所有连接池，进程退出时自动调用
+def dispose_engines() -> None:
+    with _lock:
+        engines = list(_engines.values())
+        _engines.clear()
+        _counters.clear()
+    for engine in engines:
+        engine.dispose()
+
+atexit.register(dispose_engines)
@@ -1,12 +1,16 @@
-from database_config import DatabaseConfig
+from mssql_config import DatabaseConfig
 from models import TDeviceType, TDeviceInfo, TBatch, TDeviceBatch, TTQBatchRealtime, TTQBatchArchive, TSXBatchArchive
-from models import get_archive_table_class
+from models import get_archive_table_class, ARCHIVE_TABLE_MAPPING
+from query_cache import cached_query
 import pandas as pd
-from sqlalchemy import select, text
+from sqlalchemy import select, text, bindparam, Select
+from functools import lru_cache
+from typing import Iterator
 
 
 # 基础方法
 #获取设备类型
+@cached_query('t_device_type')
 def get_device_type_df(database_config: DatabaseConfig) -> pd.DataFrame:
     with database_config.get_session() as session:
         device_type_query = (
@@ -17,6 +21,7 @@ def get_device_type_df(database_config: DatabaseConfig) -> pd.DataFrame:
         return pd.read_sql(device_type_query, session.connection())
 
 # 获取指定设备类型的设备
+@cached_query('t_device_info')
 def get_device_df(database_config: DatabaseConfig, device_type_id: int = 0) -> pd.DataFrame:
     with database_config.get_session() as session:
         device_list_query = (
@@ -55,70 +60,118 @@ def get_batch_info_df(database_config: DatabaseConfig) -> pd.DataFrame:
         )
         return pd.read_sql(batch_info_query, session.connection())
 
-# 工厂方法
-# 获取报表数据
-def get_report_data_df(database_config: DatabaseConfig, batch_number: str, device_id: int):
+# 设备ID → 归档表名映射，设备类型很少变动，缓存在内存中
+@cached_query('t_device_info')
+def get_device_archive_table_map(database_config: DatabaseConfig) -> dict[int, str]:
     with database_config.get_session() as session:
-        report_table_name_query = (
-            select(TDeviceType.archive_table_name)
-            .join(TDeviceInfo, TDeviceInfo.device_type_id == TDeviceType.device_type_id)
-            .where(TDeviceInfo.device_id == device_id)
-        )
-        report_table_name_str = session.execute(report_table_name_query).scalar_one_or_none()
-        if not report_table_name_str:
-            raise ValueError(f"未找到设备ID {device_id} 的报表表名")
-        report_table_name = get_archive_table_class(report_table_name_str)
-
-        device_batch_id_query = (
-            select(TDeviceBatch.device_batch_id)
-            .where(TDeviceBatch.device_id == device_id, TDeviceBatch.batch_number == batch_number)
+        archive_table_query = (
+            select(TDeviceInfo.device_id,
+                   TDeviceType.archive_table_name)
+            .join(TDeviceType, TDeviceInfo.device_type_id == TDeviceType.device_type_id)
         )
-        device_batch_id = session.execute(device_batch_id_query).scalar_one_or_none()
-        if not device_batch_id:
-            raise ValueError(f"设备ID {device_id}  批次号 {batch_number}  设备批次不存在")
+        return {device_id: table_name for device_id, table_name in session.execute(archive_table_query)}
 
-        batch_info_query = (
-            select(TBatch.batch_number,
-                   TBatch.product_name,
-                   TBatch.batch_quantity,
-                   TBatch.start_time,
-                   TBatch.end_time)
-            .where(TBatch.batch_number == batch_number)
-        )
+# 报表数据查询主体：经由设备批次关联归档数据、设备信息和批次信息
+def _build_report_data_select(report_table_name_str: str) -> Select:
+    report_table_name = get_archive_table_class(report_table_name_str)
+    return (
+        select(report_table_name,
+               TDeviceInfo.device_id,
+               TDeviceInfo.device_name,
+               TBatch.batch_number,
+               TBatch.product_name,
+               TBatch.batch_quantity,
+               TBatch.start_time,
+               TBatch.end_time)
+        .select_from(TDeviceBatch)
+        .join(report_table_name, report_table_name.device_batch_id == TDeviceBatch.device_batch_id)
+        .join(TDeviceInfo, TDeviceInfo.device_id == TDeviceBatch.device_id)
+        .join(TBatch, TBatch.batch_number == TDeviceBatch.batch_number)
+    )
 
-        device_info_query = (
-            select(TDeviceInfo.device_id,
-                   TDeviceInfo.device_name)
-            .where(TDeviceInfo.device_id == device_id)
-        )
+# 每张归档表的报表查询只构建一次，设备批次、设备信息、批次信息和归档数据一次查询取回
+@lru_cache(maxsize=None)
+def _get_report_data_query(report_table_name_str: str) -> Select:
+    return (
+        _build_report_data_select(report_table_name_str)
+        .where(TDeviceBatch.device_id == bindparam('device_id'),
+               TDeviceBatch.batch_number == bindparam('batch_number'))
+    )
 
-        report_data_query = (
-            select(report_table_name,
-                   TDeviceInfo.device_id,
-                   TDeviceInfo.device_name,
-                   TBatch.batch_number,
-                   TBatch.product_name,
-                   TBatch.batch_quantity,
-                   TBatch.start_time,
-                   TBatch.end_time)
-            .select_from(report_table_name)
-            .join(TDeviceInfo, TDeviceInfo.device_id == device_id)
-            .join(TBatch, TBatch.batch_number == batch_number)
-            .where(report_table_name.device_batch_id == device_batch_id)
-        )
-        report_data_df = pd.read_sql(report_data_query, session.connection())
+# 批量报表查询：按批次号集合和设备ID集合过滤，取回后再按精确的 (批次号, 设备ID) 拆分
+@lru_cache(maxsize=None)
+def _get_bulk_report_data_query(report_table_name_str: str) -> Select:
+    return (
+        _build_report_data_select(report_table_name_str)
+        .where(TDeviceBatch.device_id.in_(bindparam('device_ids', expanding=True)),
+               TDeviceBatch.batch_number.in_(bindparam('batch_numbers', expanding=True)))
+    )
+
+# 工厂方法
+# 获取报表数据
+def get_report_data_df(database_config: DatabaseConfig, batch_number: str, device_id: int):
+    report_table_name_str = get_device_archive_table_map(database_config).get(device_id)
+    if not report_table_name_str:
+        raise ValueError(f"未找到设备ID {device_id} 的报表表名")
+    report_data_query = _get_report_data_query(report_table_name_str)
+    with database_config.get_session() as session:
+        report_data_df = pd.read_sql(report_data_query, session.connection(),
+                                     params={'device_id': device_id, 'batch_number': batch_number})
         if report_data_df.empty:
-            raise ValueError(f"设备ID {device_id}  批次号 {batch_number}  报表数据不存在")
-        
+            raise ValueError(f"设备ID {device_id}  批次号 {batch_number}  设备批次或报表数据不存在")
+
         return report_table_name_str, report_data_df
 
+# 批量获取报表数据，按归档表分组，每组每块只查询一次
+def iter_bulk_report_data_df(
+        database_config: DatabaseConfig,
+        pairs: list[tuple[str, int]],
+        chunk_size: int = 500) -> Iterator[tuple[tuple[str, int], str | None, pd.DataFrame]]:
+    """
+    批量获取多个设备批次的报表数据
+
+    Args:
+        pairs: (batch_number, device_id) 列表
+        chunk_size: 每次查询的设备批次数，受 SQL Server 参数个数上限约束
+
+    Yields:
+        ((batch_number, device_id), 归档表名, 报表数据)，未找到的设备批次或归档表未登记的设备返回 (None, 空 DataFrame)
+    """
+    archive_table_map = get_device_archive_table_map(database_config)
+    groups: dict[str | None, list[tuple[str, int]]] = {}
+    for pair in dict.fromkeys(pairs):
+        name = archive_table_map.get(pair[1])
+        # 归档表不在 ARCHIVE_TABLE_MAPPING 中的设备同样按无数据处理，不中断整个批量查询
+        groups.setdefault(name if name in ARCHIVE_TABLE_MAPPING else None, []).append(pair)
+
+    for pair in groups.pop(None, []):
+        yield pair, None, pd.DataFrame()
+
+    for report_table_name_str, group_pairs in groups.items():
+        bulk_query = _get_bulk_report_data_query(report_table_name_str)
+        for i in range(0, len(group_pairs), chunk_size):
+            chunk = group_pairs[i:i + chunk_size]
+            params = {
+                'batch_numbers': sorted({bn for bn, _ in chunk}),
+                'device_ids': sorted({di for _, di in chunk}),
+            }
+            with database_config.get_session() as session:
+                chunk_df = pd.read_sql(bulk_query, session.connection(), params=params)
+            # 批次号和设备ID分别取并集会多取少量记录，这里按精确的组合拆分
+            frames = {key: df.reset_index(drop=True)
+                      for key, df in chunk_df.groupby(['batch_number', 'device_id'], sort=False)}
+            for pair in chunk:
+                yield pair, report_table_name_str, frames.get(pair, chunk_df.iloc[0:0])
+
 # 获取设备类型下拉框使用的(id, name)元组列表
+@cached_query('t_device_type')
 def get_device_type_tuple(database_config: DatabaseConfig) -> list[tuple]:
     device_types_df = get_device_type_df(database_config)
     device_type_tuple = list(zip(device_types_df['device_type_id'], device_types_df['type_name']))
     return device_type_tuple
 
 # 获取设备下拉框使用的(id, name)元组列表
+@cached_query('t_device_info')
 def get_device_tuple(database_config: DatabaseConfig, device_type_id: int = 0) -> list[tuple]:
     device_df = get_device_df(database_config, device_type_id)
     device_tuple = list(zip(device_df['device_id'], device_df['device_name']))
@@ -131,7 +184,11 @@ def get_search_batchs_data(
         device_id: int,
         start_time: str | None,
         end_time: str | None,
-        realtime: bool) -> tuple[pd.DataFrame, pd.DataFrame]:
+        realtime: bool,
+        normalized: bool = False) -> tuple[pd.DataFrame, pd.DataFrame]:
+    # 规范化模式：批次和设备分两次查询，不再联表后在 pandas 中去重
+    if normalized:
+        return _get_search_batchs_normalized(database_config, batch_number, device_id, start_time, end_time, realtime)
     batch_query = """
         SELECT  b.batch_number,
                 b.product_name,
@@ -176,3 +233,162 @@ def get_search_batchs_data(
         device_cols = ["product_name", "batch_quantity", "start_time", "end_time", "batch_state"]
         device_df = result.drop(columns=device_cols)
         return batch_df, device_df
+
+# 批次级查询条件（不含设备条件），分页查询与计数共用
+def _build_batch_filters(
+        batch_number: str,
+        device_id: int,
+        start_time: str | None,
+        end_time: str | None,
+        realtime: bool) -> tuple[str, dict]:
+    where = " WHERE 1=1"
+    params = {}
+    if batch_number:
+        where += " AND b.batch_number LIKE %(batch_number)s"
+        params['batch_number'] = batch_number
+    if device_id:
+        where += (" AND EXISTS (SELECT 1 FROM t_device_batch fdb"
+                  " WHERE fdb.batch_number = b.batch_number AND fdb.device_id = %(device_id)s)")
+        params['device_id'] = device_id
+    if start_time:
+        where += " AND b.start_time >= %(start_time)s"
+        params['start_time'] = start_time
+    if end_time:
+        where += " AND (b.end_time <= %(end_time)s OR b.end_time IS NULL)"
+        params['end_time'] = end_time
+    if realtime:
+        where += " AND b.end_time IS NULL"
+    else:
+        where += " AND b.end_time IS NOT NULL"
+    return where, params
+
+# 键集分页条件：按 (start_time DESC, batch_number DESC) 取游标之后的记录，start_time 为空的批次排在最后
+def _build_keyset_filter(cursor: tuple | None) -> tuple[str, dict]:
+    if cursor is None:
+        return "", {}
+    cursor_time, cursor_batch = cursor
+    if cursor_time is None or pd.isna(cursor_time):
+        return (" AND b.start_time IS NULL AND b.batch_number < %(cursor_batch)s",
+                {'cursor_batch': cursor_batch})
+    if isinstance(cursor_time, pd.Timestamp):
+        cursor_time = cursor_time.to_pydatetime()
+    return (" AND (b.start_time < %(cursor_time)s OR b.start_time IS NULL"
+            " OR (b.start_time = %(cursor_time)s AND b.batch_number < %(cursor_batch)s))",
+            {'cursor_time': cursor_time, 'cursor_batch': cursor_batch})
+
+# 按批次号批量查询设备批次，批次号较多时分块，避免超出参数个数上限
+def _query_batch_devices(session, batch_numbers: list[str], device_id: int = 0, chunk_size: int = 1000) -> pd.DataFrame:
+    device_cols = ["batch_number", "device_id", "device_name", "device_state",
+                   "device_batch_start_time", "device_batch_end_time"]
+    frames = []
+    for i in range(0, len(batch_numbers), chunk_size):
+        chunk = batch_numbers[i:i + chunk_size]
+        params = {f"bn_{j}": bn for j, bn in enumerate(chunk)}
+        placeholders = ", ".join(f"%({k})s" for k in params)
+        device_query = f"""
+            SELECT  db.batch_number,
+                    di.device_id,
+                    di.device_name,
+                    di.device_state,
+                    db.start_time AS device_batch_start_time,
+                    db.end_time AS device_batch_end_time
+            FROM    t_device_batch db
+            JOIN    t_device_info di ON db.device_id = di.device_id
+            WHERE   db.batch_number IN ({placeholders})
+        """
+        if device_id:
+            device_query += " AND db.device_id = %(device_id)s"
+            params['device_id'] = device_id
+        device_query += " ORDER BY db.batch_number, di.device_id"
+        frames.append(pd.read_sql(device_query, session.connection(), params=params))
+    if not frames:
+        return pd.DataFrame(columns=device_cols)
+    return pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+
+def _get_search_batchs_normalized(
+        database_config: DatabaseConfig,
+        batch_number: str,
+        device_id: int,
+        start_time: str | None,
+        end_time: str | None,
+        realtime: bool) -> tuple[pd.DataFrame, pd.DataFrame]:
+    where, params = _build_batch_filters(batch_number, device_id, start_time, end_time, realtime)
+    batch_query = f"""
+        SELECT  b.batch_number,
+                b.product_name,
+                b.batch_quantity,
+                b.start_time,
+                b.end_time,
+                b.batch_state
+        FROM    t_batch b
+        {where}
+        ORDER BY b.start_time DESC
+    """
+    with database_config.get_session() as session:
+        batch_df = pd.read_sql(batch_query, session.connection(), params=params)
+        if batch_df.empty:
+            return pd.DataFrame(), pd.DataFrame()
+        device_df = _query_batch_devices(session, batch_df["batch_number"].tolist(), device_id)
+        return batch_df, device_df
+
+# 分页条件查询批次：先取当前页批次，再按批次号取设备，两次查询都不产生冗余行
+def get_search_batchs_page(
+        database_config: DatabaseConfig,
+        batch_number: str,
+        device_id: int,
+        start_time: str | None,
+        end_time: str | None,
+        realtime: bool,
+        cursor: tuple | None = None,
+        page_size: int = 20) -> tuple[pd.DataFrame, pd.DataFrame, tuple | None]:
+    """
+    键集分页查询批次
+
+    Args:
+        cursor: 上一页最后一条批次的 (start_time, batch_number)，为 None 时取第一页
+        page_size: 每页批次数
+
+    Returns:
+        (batch_df, device_df, next_cursor)，没有下一页时 next_cursor 为 None
+    """
+    where, params = _build_batch_filters(batch_number, device_id, start_time, end_time, realtime)
+    keyset, keyset_params = _build_keyset_filter(cursor)
+    params.update(keyset_params)
+    # 多取一条用于判断是否还有下一页
+    params['page_size'] = page_size + 1
+    batch_query = f"""
+        SELECT  TOP (%(page_size)s)
+                b.batch_number,
+                b.product_name,
+                b.batch_quantity,
+                b.start_time,
+                b.end_time,
+                b.batch_state
+        FROM    t_batch b
+        {where}{keyset}
+        ORDER BY b.start_time DESC, b.batch_number DESC
+    """
+    with database_config.get_session() as session:
+        batch_df = pd.read_sql(batch_query, session.connection(), params=params)
+        if batch_df.empty:
+            return pd.DataFrame(), pd.DataFrame(), None
+        next_cursor = None
+        if len(batch_df) > page_size:
+            batch_df = batch_df.iloc[:page_size]
+            last = batch_df.iloc[-1]
+            next_cursor = (last["start_time"], last["batch_number"])
+        device_df = _query_batch_devices(session, batch_df["batch_number"].tolist(), device_id)
+        return batch_df, device_df, next_cursor
+
+# 符合条件的批次精确总数，只统计批次表，不做设备联表；需要扫描所有符合条件的批次，页面上勾选“统计总数”时才调用
+def count_search_batchs(
+        database_config: DatabaseConfig,
+        batch_number: str,
+        device_id: int,
+        start_time: str | None,
+        end_time: str | None,
+        realtime: bool) -> int:
+    where, params = _build_batch_filters(batch_number, device_id, start_time, end_time, realtime)
+    count_query = f"SELECT COUNT(*) FROM t_batch b {where}"
+    with database_config.get_session() as session:
+        return int(session.connection().exec_driver_sql(count_query, params).scalar() or 0)
@@ -0,0 +1,151 @@
+from iotdb.SessionPool import SessionPool
+from iotdb_config import IotdbConfig
+from iotdb_reader import read_result_arrays
+from series_cache import SeriesCache, get_series_cache, is_closed_window
+from dataclasses import dataclass
+from datetime import datetime
+from zoneinfo import ZoneInfo
+from typing import Any
+import numpy as np
+import pandas as pd
+import math
+
+# 归档表中的时间为本地时间（北京时间）
+LOCAL_TZ = ZoneInfo("Asia/Shanghai")
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+# 每个阶段返回的目标点数，用于确定聚合间隔
+DEFAULT_TARGET_POINTS = 500
+# 可选的聚合间隔（毫秒），按窗口长度和目标点数向上取最接近的一档
+INTERVAL_STEPS_MS = (
+    1_000, 2_000, 5_000, 10_000, 15_000, 30_000,
+    60_000, 120_000, 300_000, 600_000, 900_000, 1_800_000, 3_600_000,
+)
+AGGREGATIONS = ('avg', 'max_value', 'min_value', 'first_value', 'last_value')
+
+# 各归档表的阶段时间窗口字段 {阶段: (开始时间字段, 结束时间字段)}
+PHASE_WINDOWS: dict[str, dict[str, tuple[str, str]]] = {
+    't_tq_batch_archive': {
+        'up_temp': ('p1_up_temp_start_time', 'p1_up_temp_end_time'),
+        'hold_temp': ('p1_hold_temp_start_time', 'p1_hold_temp_end_time'),
+        'p1': ('p1_start_time', 'p1_end_time'),
+    },
+}
+# 各归档表在 IoTDB 中的设备路径模板和测点
+TREND_SOURCES: dict[str, tuple[str, tuple[str, ...]]] = {
+    't_tq_batch_archive': ("root.test_group.tq_tank_{device_id}", ("temp", "press")),
+}
+
+
+@dataclass(slots=True)
+class PhaseTrend:
+    phase: str
+    start_ms: int
+    end_ms: int
+    interval_ms: int
+    timestamps: np.ndarray              # int64 毫秒时间戳
+    values: dict[str, np.ndarray]       # 测点 -> float32 数组，无数据的区间为 NaN
+
+
+# 报表数据中的时间（字符串、datetime 或 Timestamp）转为毫秒时间戳，不带时区的按本地时间处理
+def to_epoch_ms(value: Any) -> int | None:
+    if value is None or value == '':
+        return None
+    if isinstance(value, str):
+        try:
+            value = datetime.strptime(value, TIME_FORMAT)
+        except ValueError:
+            return None
+    if isinstance(value, pd.Timestamp):
+        if pd.isna(value):
+            return None
+        value = value.to_pydatetime()
+    if not isinstance(value, datetime):
+        return None
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=LOCAL_TZ)
+    return int(value.timestamp() * 1000)
+
+def get_phase_windows(record: Any, table_name: str) -> dict[str, tuple[int, int]]:
+    """
+    由归档数据的阶段开始/结束时间得到各阶段时间窗口 {阶段: (开始毫秒, 结束毫秒)}，时间缺失或无效的阶段跳过
+    """
+    phase_fields = PHASE_WINDOWS.get(table_name)
+    if phase_fields is None:
+        raise ValueError(f"不支持的报表类型: {table_name}")
+    windows = {}
+    for phase, (start_field, end_field) in phase_fields.items():
+        start_ms = to_epoch_ms(getattr(record, start_field, None))
+        end_ms = to_epoch_ms(getattr(record, end_field, None))
+        if start_ms is not None and end_ms is not None and end_ms > start_ms:
+            windows[phase] = (start_ms, end_ms)
+    return windows
+
+def choose_interval_ms(start_ms: int, end_ms: int, target_points: int = DEFAULT_TARGET_POINTS) -> int:
+    """
+    按窗口长度和目标点数选择聚合间隔，取不小于 窗口长度/目标点数 的最小一档
+    """
+    raw = math.ceil((end_ms - start_ms) / max(target_points, 1))
+    for step in INTERVAL_STEPS_MS:
+        if step >= raw:
+            return step
+    # 超出最大档位时按整小时取整
+    return math.ceil(raw / INTERVAL_STEPS_MS[-1]) * INTERVAL_STEPS_MS[-1]
+
+def build_trend_query(device_path: str, measurements: tuple[str, ...] | list[str],
+                      start_ms: int, end_ms: int, interval_ms: int, aggregation: str = 'avg') -> str:
+    if aggregation not in AGGREGATIONS:
+        raise ValueError(f"不支持的聚合方式: {aggregation}")
+    columns = ', '.join(f"{aggregation}({m})" for m in measurements)
+    return f"SELECT {columns} FROM {device_path} GROUP BY ([{start_ms}, {end_ms}), {interval_ms}ms)"
+
+def fetch_phase_trend(iotdb_config: IotdbConfig, session_pool: SessionPool, device_path: str,
+                      measurements: tuple[str, ...] | list[str], phase: str, start_ms: int, end_ms: int,
+                      target_points: int = DEFAULT_TARGET_POINTS, aggregation: str = 'avg',
+                      cache: SeriesCache | None = None) -> PhaseTrend | None:
+    """
+    在 IoTDB 端按区间聚合查询一个阶段的趋势数据，查询失败返回 None
+
+    已结束的窗口优先读取本地时序缓存，未命中时查询后写入缓存；cache 为 None 时使用全局缓存。
+    """
+    interval_ms = choose_interval_ms(start_ms, end_ms, target_points)
+    closed = is_closed_window(end_ms)
+    cache = (cache or get_series_cache()) if closed else None
+    if cache is not None:
+        arrays = cache.get_arrays(device_path, measurements, start_ms, end_ms, interval_ms, aggregation)
+        if arrays is not None:
+            return PhaseTrend(phase, start_ms, end_ms, interval_ms, arrays.timestamps, arrays.values)
+    sql = build_trend_query(device_path, measurements, start_ms, end_ms, interval_ms, aggregation)
+    with iotdb_config.get_session(session_pool) as session:
+        result = session.execute_query_statement(sql)
+        try:
+            # 聚合结果的列顺序与 SELECT 中的测点顺序一致，区间数已知，一次分配到位
+            arrays = read_result_arrays(result, measurements, math.ceil((end_ms - start_ms) / interval_ms))
+        finally:
+            result.close_operation_handle()
+        if cache is not None:
+            cache.put_arrays(device_path, arrays, start_ms, end_ms, interval_ms, aggregation)
+        return PhaseTrend(phase, start_ms, end_ms, interval_ms, arrays.timestamps, arrays.values)
+    return None
+
+def get_batch_trends(iotdb_config: IotdbConfig, session_pool: SessionPool, record: Any, table_name: str,
+                     target_points: int = DEFAULT_TARGET_POINTS, aggregation: str = 'avg') -> dict[str, PhaseTrend]:
+    """
+    获取一个设备批次各阶段（升温、保温、一次煎煮整体）的趋势数据
+
+    Args:
+        record: 清洗后的报表数据，需包含 device_id 和阶段开始/结束时间字段
+        table_name: 归档表名，决定阶段字段、设备路径和测点
+        target_points: 每个阶段的目标点数，聚合间隔据此确定
+    """
+    source = TREND_SOURCES.get(table_name)
+    if source is None:
+        raise ValueError(f"不支持的报表类型: {table_name}")
+    path_template, measurements = source
+    device_path = path_template.format(device_id=record.device_id)
+    trends = {}
+    for phase, (start_ms, end_ms) in get_phase_windows(record, table_name).items():
+        trend = fetch_phase_trend(iotdb_config, session_pool, device_path, measurements, phase,
+                                  start_ms, end_ms, target_points, aggregation)
+        if trend is not None:
+            trends[phase] = trend
+    return trends
@@ -0,0 +1,116 @@
+from iotdb_reader import IotdbArrays
+from typing import Callable
+import numpy as np
+
+# 默认目标点数，约等于图表宽度（像素）
+DEFAULT_TARGET_POINTS = 1000
+
+
+def _valid(y: np.ndarray) -> np.ndarray:
+    """
+    有效（非 NaN）点在原数组中的下标
+    """
+    return np.flatnonzero(~np.isnan(y))
+
+def minmax_indices(x: np.ndarray, y: np.ndarray, target_points: int = DEFAULT_TARGET_POINTS) -> np.ndarray:
+    """
+    按时间等分为 target_points / 2 个区间，每个区间保留最小值和最大值所在的点，首尾点始终保留
+
+    每个区间的极值都在结果中，压力突升等尖峰不会被抹掉。
+    """
+    valid = _valid(y)
+    if len(valid) <= target_points:
+        return valid
+    xv, yv = x[valid], y[valid]
+    buckets = max(target_points // 2, 1)
+    edges = np.linspace(xv[0], xv[-1], buckets + 1)
+    bucket_ids = np.searchsorted(edges, xv, side='right') - 1
+    np.minimum(bucket_ids, buckets - 1, out=bucket_ids)
+    # 只处理非空区间，starts 为每个区间第一个点的位置
+    starts = np.flatnonzero(np.diff(bucket_ids, prepend=-1))
+    bucket_max = np.maximum.reduceat(yv, starts)
+    bucket_min = np.minimum.reduceat(yv, starts)
+    # 区间编号展开到每个点，取区间内第一个等于极值的点
+    positions = np.repeat(np.arange(len(starts)), np.diff(starts, append=len(yv)))
+    is_max = yv == bucket_max[positions]
+    is_min = yv == bucket_min[positions]
+    max_idx = np.flatnonzero(is_max)[np.unique(positions[is_max], return_index=True)[1]]
+    min_idx = np.flatnonzero(is_min)[np.unique(positions[is_min], return_index=True)[1]]
+    selected = np.unique(np.concatenate(([0, len(yv) - 1], max_idx, min_idx)))
+    return valid[selected]
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, target_points: int = DEFAULT_TARGET_POINTS,
+                 keep_extremes: bool = True) -> np.ndarray:
+    """
+    最大三角形三桶算法（Largest-Triangle-Three-Buckets），曲线形状保留较好
+
+    按点数等分区间，每个区间选与上一个选中点、下一区间均值构成三角形面积最大的点；区间内计算向量化。
+    keep_extremes 为 True 时额外保留全局最大值和最小值所在的点。
+    """
+    valid = _valid(y)
+    n = len(valid)
+    if n <= target_points or target_points < 3:
+        return valid
+    xv = (x[valid] - x[valid[0]]).astype(np.float64)
+    yv = y[valid].astype(np.float64)
+    # 首尾点单独保留，中间的点分为 target_points - 2 个区间
+    edges = np.linspace(1, n - 1, target_points - 1).astype(np.int64)
+    # 各区间均值一次算出，作为上一区间三角形的第三个点
+    sums_x = np.add.reduceat(xv[:n - 1], edges[:-1])
+    sums_y = np.add.reduceat(yv[:n - 1], edges[:-1])
+    counts = np.diff(edges)
+    avg_x = np.append(sums_x / counts, xv[-1])[1:]
+    avg_y = np.append(sums_y / counts, yv[-1])[1:]
+    selected = np.empty(target_points, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    prev = 0
+    for i in range(target_points - 2):
+        lo, hi = edges[i], edges[i + 1]
+        px, py = xv[prev], yv[prev]
+        areas = np.abs((px - avg_x[i]) * (yv[lo:hi] - py) - (px - xv[lo:hi]) * (avg_y[i] - py))
+        prev = lo + int(np.argmax(areas))
+        selected[i + 1] = prev
+    if keep_extremes:
+        selected = np.unique(np.concatenate((selected, [np.argmax(yv), np.argmin(yv)])))
+    return valid[selected]
+
+
+# 降采样方法 {名称: 下标选择函数}
+DOWNSAMPLE_METHODS: dict[str, Callable[[np.ndarray, np.ndarray, int], np.ndarray]] = {
+    'minmax': minmax_indices,
+    'lttb': lttb_indices,
+}
+
+def downsample(timestamps: np.ndarray, values: np.ndarray, target_points: int = DEFAULT_TARGET_POINTS,
+               method: str = 'minmax') -> tuple[np.ndarray, np.ndarray]:
+    """
+    单条曲线降采样到约 target_points 个点，NaN 点丢弃
+
+    Args:
+        method: minmax 保证每个区间的极值（适合压力等需要看尖峰的测点），lttb 保留曲线形状
+    """
+    select = DOWNSAMPLE_METHODS.get(method)
+    if select is None:
+        raise ValueError(f"不支持的降采样方法: {method}")
+    indices = select(timestamps, values, target_points)
+    return timestamps[indices], values[indices]
+
+def downsample_arrays(arrays: IotdbArrays, target_points: int = DEFAULT_TARGET_POINTS,
+                      method: str = 'minmax') -> IotdbArrays:
+    """
+    多测点结果降采样，各测点选中的点取并集，保持时间戳对齐
+
+    点数最多为 测点数 * target_points，某测点在另一测点选中的时间点上取原值。
+    """
+    select = DOWNSAMPLE_METHODS.get(method)
+    if select is None:
+        raise ValueError(f"不支持的降采样方法: {method}")
+    if len(arrays) <= target_points:
+        return arrays
+    indices = np.unique(np.concatenate(
+        [select(arrays.timestamps, values, target_points) for values in arrays.values.values()]
+    ))
+    return IotdbArrays(
+        np.ascontiguousarray(arrays.timestamps[indices]),
+        {name: np.ascontiguousarray(values[indices]) for name, values in arrays.values.items()},
+    )
@@ -1,4 +1,5 @@
 from iotdb_config import IotdbConfig
+from iotdb_reader import read_result_arrays
 from iotdb.utils.IoTDBConstants import TSDataType, TSEncoding, Compressor
 from iotdb.utils.NumpyTablet import NumpyTablet
 import atexit
@@ -37,9 +38,11 @@ def get_data_point_value(iotdb_config: IotdbConfig, session_pool, paths: list, s
     with iotdb_config.get_session(session_pool) as session:
         sql = f"SELECT {', '.join(paths)} FROM root.test_group GROUP BY ([{start_time}, {end_time}), {interval}s)"
         result = session.execute_query_statement(sql)
-        session.execute_aggregation_query(sql)
-        df_result = result.todf()
-        return df_result
+        try:
+            # 结果直接读入 NumPy 数组，索引为本地时间
+            return read_result_arrays(result).to_frame()
+        finally:
+            result.close_operation_handle()
 
 def execute_query(iotdb_config: IotdbConfig, session_pool, sql: str):
     with iotdb_config.get_session(session_pool) as session:
@@ -11,13 +11,13 @@ class IotdbConfig:
         self.port = "6667"
         self.username = "root"
         self.password = "root"
+        self.max_pool_size = 5
+        self.wait_timeout_ms = 3000
     
     def create_session_pool(self):
         pool_config = PoolConfig(host=self.ip, port=self.port, user_name=self.username,password=self.password,
                                  fetch_size=1024,time_zone="UTC+8", max_retry=3)
-        max_pool_size = 5
-        wait_timeout_ms = 3000
-        session_pool = SessionPool(pool_config, max_pool_size, wait_timeout_ms)
+        session_pool = SessionPool(pool_config, self.max_pool_size, self.wait_timeout_ms)
         return session_pool
 
     @contextmanager
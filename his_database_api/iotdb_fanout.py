@@ -0,0 +1,135 @@
+from iotdb.SessionPool import SessionPool
+from iotdb_config import IotdbConfig
+from batch_trend import build_trend_query
+from iotdb_reader import IotdbArrays, LOCAL_OFFSET_MS, TIME_COLUMN, read_result_arrays
+from series_cache import SeriesCache, RAW, get_series_cache, is_closed_window
+from concurrent.futures import ThreadPoolExecutor, Future, as_completed
+import numpy as np
+import pandas as pd
+import math
+import time
+
+# 单个查询的超时时间（秒），同时作为 IoTDB 服务端查询超时
+DEFAULT_QUERY_TIMEOUT = 30
+
+
+def build_raw_query(device_path: str, measurements: tuple[str, ...] | list[str], start_ms: int, end_ms: int) -> str:
+    return f"SELECT {', '.join(measurements)} FROM {device_path} WHERE time >= {start_ms} AND time < {end_ms}"
+
+
+class IotdbFanout:
+    """
+    多设备查询并发执行器
+
+    按设备拆分为独立查询，在会话池上并发执行（并发数不超过会话池大小），结果按时间对齐合并为一张表。
+    IotdbConfig.get_session 会吞掉查询异常，失败或超时的设备不出现在结果中，原因记录在返回的 errors 里。
+    已结束的窗口先读本地时序缓存，只查询未命中的设备，查询结果写入缓存；use_cache=False 时始终查询 IoTDB。
+    """
+    def __init__(self, iotdb_config: IotdbConfig, session_pool: SessionPool,
+                 max_concurrency: int | None = None, query_timeout: float = DEFAULT_QUERY_TIMEOUT,
+                 use_cache: bool = True, cache: SeriesCache | None = None):
+        pool_size = getattr(iotdb_config, 'max_pool_size', 1)
+        self.iotdb_config = iotdb_config
+        self.session_pool = session_pool
+        self.max_concurrency = max(1, min(max_concurrency or pool_size, pool_size))
+        self.query_timeout = query_timeout
+        self.use_cache = use_cache
+        self.cache = cache
+
+    def _run_query(self, sql: str, measurements: tuple[str, ...] | list[str]):
+        with self.iotdb_config.get_session(self.session_pool) as session:
+            result = session.execute_query_statement(sql, int(self.query_timeout * 1000))
+            try:
+                return read_result_arrays(result, measurements)
+            finally:
+                result.close_operation_handle()
+        return None
+
+    def query_devices(self, devices: dict[str, tuple[str, ...] | list[str]], start_ms: int, end_ms: int,
+                      interval_ms: int | None = None, aggregation: str = 'avg') -> tuple[pd.DataFrame, dict[str, str]]:
+        """
+        并发查询多个设备在 [start_ms, end_ms) 内的数据
+
+        Args:
+            devices: {设备路径: 测点列表}
+            interval_ms: 聚合间隔（毫秒），为 None 时查询原始数据
+            aggregation: 聚合方式，仅 interval_ms 不为 None 时有效
+
+        Returns:
+            (按本地时间索引对齐的数据表，列名为 "设备路径.测点"，{设备路径: 失败原因})
+        """
+        results: dict[str, IotdbArrays] = {}
+        errors: dict[str, str] = {}
+        cache = (self.cache or get_series_cache()) if self.use_cache and is_closed_window(end_ms) else None
+        aggregation = aggregation if interval_ms else RAW
+        queries = {}
+        for device_path, measurements in devices.items():
+            if cache is not None:
+                arrays = cache.get_arrays(device_path, measurements, start_ms, end_ms, interval_ms or 0, aggregation)
+                if arrays is not None:
+                    results[device_path] = arrays
+                    continue
+            if interval_ms:
+                sql = build_trend_query(device_path, measurements, start_ms, end_ms, interval_ms, aggregation)
+            else:
+                sql = build_raw_query(device_path, measurements, start_ms, end_ms)
+            queries[device_path] = (sql, tuple(measurements))
+
+        if not queries:
+            return merge_device_results({d: results[d] for d in devices if d in results}), errors
+        executor = ThreadPoolExecutor(max_workers=min(self.max_concurrency, len(queries)),
+                                      thread_name_prefix='iotdb-fanout')
+        futures: dict[Future, str] = {
+            executor.submit(self._run_query, sql, measurements): device_path
+            for device_path, (sql, measurements) in queries.items()
+        }
+        # 查询分批占用会话，整体等待时间按批数计算，另加获取会话的等待时间
+        rounds = math.ceil(len(queries) / self.max_concurrency)
+        deadline = time.monotonic() + rounds * self.query_timeout + getattr(self.iotdb_config, 'wait_timeout_ms', 0) / 1000
+        try:
+            for future in as_completed(futures, timeout=max(deadline - time.monotonic(), 0)):
+                device_path = futures[future]
+                try:
+                    data = future.result()
+                except TimeoutError as e:
+                    errors[device_path] = f"获取会话超时: {e}"
+                    continue
+                except Exception as e:
+                    errors[device_path] = f"查询失败: {e}"
+                    continue
+                if data is None:
+                    errors[device_path] = "查询失败"
+                else:
+                    results[device_path] = data
+                    if cache is not None:
+                        cache.put_arrays(device_path, data, start_ms, end_ms, interval_ms or 0, aggregation)
+        except TimeoutError:
+            for future, device_path in futures.items():
+                if not future.done():
+                    errors[device_path] = "查询超时"
+        finally:
+            # 不等待超时的查询，未开始的查询直接取消
+            executor.shutdown(wait=False, cancel_futures=True)
+
+        # 结果列按请求顺序排列
+        ordered = {device_path: results[device_path] for device_path in devices if device_path in results}
+        return merge_device_results(ordered), errors
+
+
+def merge_device_results(results: dict[str, IotdbArrays]) -> pd.DataFrame:
+    """
+    多设备结果按时间戳对齐合并，某设备缺少的时间点为 NaN
+    """
+    if not results:
+        return pd.DataFrame(index=pd.DatetimeIndex([], dtype='datetime64[ms]', name=TIME_COLUMN))
+    timestamps = np.unique(np.concatenate([arrays.timestamps for arrays in results.values()]))
+    columns = [f"{device_path}.{m}" for device_path, arrays in results.items() for m in arrays.values]
+    data = np.full((len(timestamps), len(columns)), np.nan, dtype=np.float32)
+    col = 0
+    for arrays in results.values():
+        rows = np.searchsorted(timestamps, arrays.timestamps)
+        for array in arrays.values.values():
+            data[rows, col] = array
+            col += 1
+    index = pd.DatetimeIndex((timestamps + LOCAL_OFFSET_MS).view('datetime64[ms]'), name=TIME_COLUMN)
+    return pd.DataFrame(data, index=index, columns=columns)
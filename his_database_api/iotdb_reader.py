@@ -0,0 +1,149 @@
+from iotdb.utils.SessionDataSet import SessionDataSet
+from dataclasses import dataclass
+from importlib.metadata import PackageNotFoundError, version
+import numpy as np
+import pandas as pd
+
+# 北京时间相对 UTC 的偏移（毫秒），无夏令时，时区转换只需整体加一个整数
+LOCAL_OFFSET_MS = 8 * 3600 * 1000
+TIME_COLUMN = "Time"
+# 行数未知时预分配的初始行数，不足时按倍数扩容
+INITIAL_ROWS = 4096
+# 已验证内部接口（IoTDBRpcDataSet._has_next_result_set / _process_buffer）的 apache-iotdb 客户端版本，
+# 与 requirements.txt 中固定的版本一致；其他版本只使用公开的 has_next_df / next_df 接口
+SUPPORTED_CLIENT_VERSIONS = ('2.0.11',)
+
+
+def _client_version() -> str:
+    try:
+        return version('apache-iotdb')
+    except PackageNotFoundError:
+        return ''
+
+_FAST_PATH_SUPPORTED = _client_version() in SUPPORTED_CLIENT_VERSIONS
+
+
+@dataclass(slots=True)
+class IotdbArrays:
+    timestamps: np.ndarray              # int64 毫秒时间戳（UTC）
+    values: dict[str, np.ndarray]       # 列名 -> float32 数组，空值为 NaN
+
+    def __len__(self) -> int:
+        return len(self.timestamps)
+
+    # 本地时间（北京时间）毫秒时间戳
+    def local_timestamps(self) -> np.ndarray:
+        return self.timestamps + LOCAL_OFFSET_MS
+
+    def to_frame(self) -> pd.DataFrame:
+        """
+        转为以本地时间（不带时区）为索引的 DataFrame，只在需要表格时调用
+        """
+        index = pd.DatetimeIndex(self.local_timestamps().view('datetime64[ms]'), name=TIME_COLUMN)
+        return pd.DataFrame(self.values, index=index, copy=False)
+
+
+def _to_float32(chunk) -> np.ndarray:
+    if isinstance(chunk, np.ndarray) and chunk.dtype.kind in 'fiub':
+        return chunk
+    # 含空值的整数/布尔列为 pandas 可空类型，文本列按数值解析
+    return pd.to_numeric(pd.Series(chunk), errors='coerce').to_numpy(dtype=np.float32, na_value=np.nan)
+
+
+class _ArrayBuffer:
+    """
+    预分配的列缓冲区，按批次写入，容量不足时按倍数扩容
+    """
+    __slots__ = ('timestamps', 'values', 'size')
+
+    def __init__(self, columns: int, capacity: int):
+        self.timestamps = np.empty(capacity, dtype=np.int64)
+        self.values = np.empty((columns, capacity), dtype=np.float32)
+        self.size = 0
+
+    def _reserve(self, rows: int) -> None:
+        needed = self.size + rows
+        capacity = len(self.timestamps)
+        if needed <= capacity:
+            return
+        while capacity < needed:
+            capacity *= 2
+        timestamps = np.empty(capacity, dtype=np.int64)
+        timestamps[:self.size] = self.timestamps[:self.size]
+        values = np.empty((self.values.shape[0], capacity), dtype=np.float32)
+        values[:, :self.size] = self.values[:, :self.size]
+        self.timestamps, self.values = timestamps, values
+
+    def append(self, timestamps: np.ndarray | None, columns: list) -> None:
+        rows = len(timestamps) if timestamps is not None else len(columns[0]) if columns else 0
+        self._reserve(rows)
+        end = self.size + rows
+        if timestamps is not None:
+            self.timestamps[self.size:end] = timestamps
+        else:
+            self.timestamps[self.size:end] = 0
+        for i, chunk in enumerate(columns):
+            # 批内全为空值的列可能只返回空数组
+            if len(chunk) == rows:
+                self.values[i, self.size:end] = _to_float32(chunk)
+            else:
+                self.values[i, self.size:end] = np.nan
+        self.size = end
+
+
+def _iter_batches(result: SessionDataSet):
+    """
+    逐批读取查询结果，每批为 (时间戳数组, [各列数组])
+
+    客户端版本在 SUPPORTED_CLIENT_VERSIONS 中时直接使用数据集按 TsBlock 解码出的 NumPy 数组，不构建中间 DataFrame；
+    其他版本的内部接口可能改变，退回 next_df 分块读取。
+    """
+    rpc_ds = getattr(result, 'iotdb_rpc_data_set', None) if _FAST_PATH_SUPPORTED else None
+    has_time = result.get_column_names()[:1] == [TIME_COLUMN]
+    if rpc_ds is not None and hasattr(rpc_ds, '_process_buffer') and hasattr(rpc_ds, '_has_next_result_set'):
+        while rpc_ds._has_next_result_set():
+            batch = rpc_ds._process_buffer()
+            keys = sorted(batch)
+            time_chunks = batch[keys[0]] if has_time else None
+            columns = [batch[k] for k in (keys[1:] if has_time else keys)]
+            blocks = len(time_chunks) if has_time else len(columns[0]) if columns else 0
+            for j in range(blocks):
+                yield (time_chunks[j] if has_time else None), [c[j] for c in columns]
+        return
+    while result.has_next_df():
+        df = result.next_df()
+        if df is None:
+            break
+        if has_time:
+            yield df.iloc[:, 0].to_numpy(dtype=np.int64), [df.iloc[:, i].to_numpy() for i in range(1, df.shape[1])]
+        else:
+            yield None, [df.iloc[:, i].to_numpy() for i in range(df.shape[1])]
+
+
+def read_result_arrays(result: SessionDataSet, columns: tuple[str, ...] | list[str] | None = None,
+                       expected_rows: int = 0) -> IotdbArrays:
+    """
+    将查询结果读入预分配的 NumPy 数组：时间戳为 int64 毫秒，数值为 float32
+
+    Args:
+        result: execute_query_statement 返回的数据集，调用方负责关闭
+        columns: 结果列名，按 SELECT 顺序对应，默认使用数据集列名
+        expected_rows: 预计行数（如 GROUP BY 的区间数），用于一次分配到位
+    """
+    names = result.get_column_names()
+    if names[:1] == [TIME_COLUMN]:
+        names = names[1:]
+    if columns is not None:
+        if len(columns) != len(names):
+            raise ValueError(f"列名数量与查询结果不一致: {len(columns)} != {len(names)}")
+        names = list(columns)
+    buffer = _ArrayBuffer(len(names), max(expected_rows, INITIAL_ROWS))
+    for timestamps, chunks in _iter_batches(result):
+        buffer.append(timestamps, chunks)
+    size = buffer.size
+    # 行数与预分配一致时直接使用缓冲区，否则复制一份紧凑数组释放多余空间
+    if size == len(buffer.timestamps):
+        timestamps, values = buffer.timestamps, buffer.values
+    else:
+        timestamps, values = buffer.timestamps[:size].copy(), buffer.values[:, :size].copy()
+    return IotdbArrays(timestamps, {name: values[i] for i, name in enumerate(names)})
@@ -2,8 +2,8 @@ import numpy as np
 from iotdb.utils.IoTDBConstants import TSDataType, TSEncoding, Compressor
 from iotdb_config import get_iotdb_config
 import get_iotdb_data
+from iotdb_reader import read_result_arrays
 import atexit
-import pandas as pd
 import time
 
 
@@ -60,11 +60,9 @@ results = get_iotdb_data.execute_query(new_iotdb, session_pool, query)
 # while results.has_next():
 #     row = results.next()
 #     print(row)
-df_results = results.todf()
-df_results["Time"] = (pd.to_datetime(df_results["Time"], unit='ms', utc=True)
-                      .dt.tz_convert("Asia/Shanghai")
-                      .dt.tz_localize(None)  # 去掉时区信息
-                      )
+# 直接读入 NumPy 数组，时间索引已转换为北京时间（不带时区）
+df_results = read_result_arrays(results).to_frame()
+results.close_operation_handle()
 print(df_results)
 
 
@@ -0,0 +1,220 @@
+from iotdb_reader import IotdbArrays
+from pathlib import Path
+import numpy as np
+import hashlib
+import tempfile
+import threading
+import time
+import os
+
+# 缓存目录与容量上限，可通过环境变量调整
+CACHE_DIR = Path(os.environ.get('SERIES_CACHE_DIR', Path(tempfile.gettempdir()) / 'iotdb_series_cache'))
+MAX_BYTES = int(os.environ.get('SERIES_CACHE_MAX_BYTES', 1024 * 1024 * 1024))
+# 窗口结束超过该时长（毫秒）才视为已关闭，留出数据补传的时间
+CLOSED_DELAY_MS = 10 * 60 * 1000
+RAW = 'raw'
+_TS_SUFFIX = '.ts.npy'
+_VALUE_SUFFIX = '.val.npy'
+
+
+def is_closed_window(end_ms: int, now_ms: int | None = None) -> bool:
+    """
+    窗口结束时间早于当前时间 CLOSED_DELAY_MS 以上，数据不再变化，可以缓存
+    """
+    now_ms = int(time.time() * 1000) if now_ms is None else now_ms
+    return end_ms <= now_ms - CLOSED_DELAY_MS
+
+
+class SeriesCache:
+    """
+    已结束窗口的本地时序缓存
+
+    每个 (设备路径, 测点组合, 分辨率) 一个子目录，每个 [start, end) 窗口存为时间戳（int64 毫秒）和数值矩阵（float32，
+    每行一个测点）两个 .npy 文件，同一窗口的各测点共用一条时间轴；读取时内存映射，不整体载入内存。
+    测点组合按查询的测点及顺序区分，只查部分测点时不会读到其他组合缓存的窗口，避免多出其他测点才有数据的时间点。
+    分辨率为 raw（原始数据）或 "聚合方式_间隔毫秒"（降采样数据）。
+    请求窗口被已缓存窗口覆盖时直接切片返回；降采样数据要求起点与缓存窗口的区间边界对齐。
+    文件按最近访问时间做 LRU 淘汰，每次写入后重新扫描目录，多进程共用目录时总大小也不超过 max_bytes。
+    """
+    def __init__(self, cache_dir: str | Path = CACHE_DIR, max_bytes: int = MAX_BYTES):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _resolution(interval_ms: int = 0, aggregation: str = RAW) -> str:
+        return RAW if not interval_ms else f"{aggregation}_{interval_ms}"
+
+    def _series_dir(self, device_path: str, measurements: tuple[str, ...], resolution: str) -> Path:
+        raw = f"{device_path}|{','.join(measurements)}|{resolution}"
+        return self.cache_dir / hashlib.sha256(raw.encode('utf-8')).hexdigest()[:32]
+
+    # 降采样数据的区间从窗口起点开始划分，请求窗口起点需落在区间边界上，终点不对齐时只能与缓存窗口终点相同
+    @staticmethod
+    def _aligned(start: int, end: int, start_ms: int, end_ms: int, interval_ms: int) -> bool:
+        return (start_ms - start) % interval_ms == 0 and ((end_ms - start_ms) % interval_ms == 0 or end == end_ms)
+
+    # 子目录下已缓存的窗口 [(start, end, 文件名前缀)]
+    @staticmethod
+    def _windows(series_dir: Path) -> list[tuple[int, int, Path]]:
+        windows = []
+        try:
+            names = os.listdir(series_dir)
+        except OSError:
+            return windows
+        for name in names:
+            if not name.endswith(_TS_SUFFIX):
+                continue
+            stem = name[:-len(_TS_SUFFIX)]
+            try:
+                start, end = (int(v) for v in stem.split('_'))
+            except ValueError:
+                continue
+            windows.append((start, end, series_dir / stem))
+        return windows
+
+    def get_arrays(self, device_path: str, measurements: tuple[str, ...] | list[str], start_ms: int, end_ms: int,
+                   interval_ms: int = 0, aggregation: str = RAW) -> IotdbArrays | None:
+        """
+        读取一个设备多个测点在 [start_ms, end_ms) 内的缓存数据，数组为内存映射的切片；无覆盖该窗口的缓存返回 None
+        """
+        measurements = tuple(measurements)
+        if not measurements:
+            return None
+        series_dir = self._series_dir(device_path, measurements, self._resolution(interval_ms, aggregation))
+        # 覆盖请求窗口的缓存中取最短的一个
+        candidates = sorted(
+            (end - start, start, end, prefix) for start, end, prefix in self._windows(series_dir)
+            if start <= start_ms and end >= end_ms and (not interval_ms or self._aligned(start, end, start_ms, end_ms, interval_ms))
+        )
+        for _, start, end, prefix in candidates:
+            ts_path = prefix.with_name(prefix.name + _TS_SUFFIX)
+            try:
+                timestamps = np.load(ts_path, mmap_mode='r')
+                values = np.load(prefix.with_name(prefix.name + _VALUE_SUFFIX), mmap_mode='r')
+                # 更新修改时间作为最近访问时间
+                os.utime(ts_path)
+            except (OSError, ValueError):
+                continue
+            # 数值矩阵必须与时间轴和测点数一致，否则视为损坏的窗口
+            if values.shape != (len(measurements), len(timestamps)):
+                continue
+            if start != start_ms or end != end_ms:
+                lo, hi = np.searchsorted(timestamps, (start_ms, end_ms))
+                timestamps, values = timestamps[lo:hi], values[:, lo:hi]
+            self.hits += 1
+            return IotdbArrays(timestamps, {m: values[i] for i, m in enumerate(measurements)})
+        self.misses += 1
+        return None
+
+    def put_arrays(self, device_path: str, arrays: IotdbArrays, start_ms: int, end_ms: int,
+                   interval_ms: int = 0, aggregation: str = RAW) -> None:
+        measurements = tuple(arrays.values)
+        if not measurements:
+            return
+        series_dir = self._series_dir(device_path, measurements, self._resolution(interval_ms, aggregation))
+        prefix = series_dir / f"{start_ms}_{end_ms}"
+        values = np.empty((len(measurements), len(arrays.timestamps)), dtype=np.float32)
+        for i, array in enumerate(arrays.values.values()):
+            values[i] = array
+        try:
+            series_dir.mkdir(parents=True, exist_ok=True)
+            # 先写数值再写时间戳，时间戳文件出现即表示该窗口完整可用；临时文件替换保证不会读到半个文件
+            for suffix, array in ((_VALUE_SUFFIX, values), (_TS_SUFFIX, np.asarray(arrays.timestamps, dtype=np.int64))):
+                with tempfile.NamedTemporaryFile(dir=series_dir, suffix='.tmp', delete=False) as f:
+                    np.save(f, array)
+                os.replace(f.name, prefix.with_name(prefix.name + suffix))
+        except OSError as e:
+            print(f"时序缓存写入失败: {e}")
+            return
+        with self._lock:
+            self._evict()
+
+    # 扫描缓存目录，返回各窗口 [(时间戳文件修改时间, 窗口总大小, 时间戳文件, 数值文件)]，每个文件只 stat 一次
+    # 缺少时间戳文件的数值文件（写入中断留下的）也计入，修改时间取数值文件本身
+    def _scan(self) -> list[tuple[float, int, Path, Path]]:
+        windows: dict[Path, list] = {}
+        try:
+            series_dirs = [entry.path for entry in os.scandir(self.cache_dir) if entry.is_dir()]
+        except OSError:
+            return []
+        for series_dir in series_dirs:
+            try:
+                entries = list(os.scandir(series_dir))
+            except OSError:
+                continue
+            for entry in entries:
+                if entry.name.endswith(_TS_SUFFIX):
+                    stem, is_ts = entry.name[:-len(_TS_SUFFIX)], True
+                elif entry.name.endswith(_VALUE_SUFFIX):
+                    stem, is_ts = entry.name[:-len(_VALUE_SUFFIX)], False
+                else:
+                    continue
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                prefix = Path(series_dir) / stem
+                window = windows.setdefault(prefix, [None, 0, 0.0])
+                window[1] += stat.st_size
+                if is_ts:
+                    window[0] = stat.st_mtime
+                else:
+                    window[2] = stat.st_mtime
+        return [
+            (ts_mtime if ts_mtime is not None else value_mtime, size,
+             prefix.with_name(prefix.name + _TS_SUFFIX), prefix.with_name(prefix.name + _VALUE_SUFFIX))
+            for prefix, (ts_mtime, size, value_mtime) in windows.items()
+        ]
+
+    # 超出容量时按时间戳文件的修改时间从旧到新删除窗口，总大小以目录实际内容为准
+    def _evict(self) -> None:
+        entries = self._scan()
+        total = sum(size for _, size, _, _ in entries)
+        if total <= self.max_bytes:
+            return
+        entries.sort()
+        for _, size, ts_path, value_path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                # 先删时间戳文件，窗口立即不可见；Windows 下正在映射的文件删除失败则跳过
+                ts_path.unlink(missing_ok=True)
+                value_path.unlink(missing_ok=True)
+            except OSError:
+                continue
+            total -= size
+            self.evictions += 1
+
+    def clear(self) -> int:
+        removed = 0
+        with self._lock:
+            for path in self.cache_dir.glob('*/*.npy'):
+                try:
+                    path.unlink()
+                    if path.name.endswith(_TS_SUFFIX):
+                        removed += 1
+                except OSError:
+                    continue
+        return removed
+
+    def stats(self) -> dict[str, int]:
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+        }
+
+
+_cache: SeriesCache | None = None
+_cache_lock = threading.Lock()
+
+def get_series_cache() -> SeriesCache:
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = SeriesCache()
+        return _cache
@@ -0,0 +1,88 @@
+from sqlalchemy import Engine
+from sqlalchemy.orm import Session
+from contextlib import contextmanager
+from pathlib import Path
+import tomllib
+import os
+from engine_registry import get_shared_engine
+
+# Streamlit 使用的配置文件，命令行等无界面场景也从这里读取
+SECRETS_PATH = Path(__file__).parent / ".streamlit" / "secrets.toml"
+# 环境变量优先于配置文件
+ENV_MAPPING = {
+    'db_host': 'DB_HOST',
+    'db_port': 'DB_PORT',
+    'db_name': 'DB_NAME',
+    'db_user': 'DB_USER',
+    'db_password': 'DB_PASSWORD',
+}
+
+
+class DatabaseConfig:
+    """
+    SQL Server 连接配置，不依赖 Streamlit
+
+    配置不完整或数据库操作失败时抛出异常，Streamlit 页面使用的 database_config.DatabaseConfig 在此基础上改为页面提示。
+    """
+    def __init__(self, host=None, port=None, name=None, username=None, password=None):
+        self.host = host
+        self.port = port
+        self.name = name
+        self.username = username
+        self.password = password
+
+    def _on_incomplete_config(self) -> None:
+        raise ValueError("数据库配置信息不完整，请检查 secrets.toml 文件或 DB_* 环境变量")
+
+    def _on_session_error(self, error: ValueError) -> None:
+        raise error
+
+    # 同一组连接参数在进程内共享一个引擎
+    def get_engine(self) -> Engine:
+        if not all([self.host, self.port, self.name, self.username, self.password]):
+            self._on_incomplete_config()
+        db_url = f"mssql+pymssql://{self.username}:{self.password}@{self.host}:{self.port}/{self.name}"
+        engine = get_shared_engine(
+            db_url,
+            pool_size=10,
+            max_overflow=20,
+            pool_pre_ping=True,
+            pool_recycle=3600,
+            # fast_executemany=True,
+        )
+        return engine
+
+    @contextmanager
+    def get_session(self):
+        session = Session(bind=self.get_engine())
+        try:
+            yield session
+        except ValueError as e:
+            session.rollback()
+            self._on_session_error(e)
+        finally:
+            session.close()
+
+
+def load_database_config(secrets_path: str | Path | None = None) -> DatabaseConfig:
+    """
+    读取 secrets.toml 的 [db_conn] 配置，DB_HOST 等环境变量覆盖文件中的同名项
+
+    Args:
+        secrets_path: 配置文件路径，默认 .streamlit/secrets.toml，文件不存在时只使用环境变量
+    """
+    settings = {}
+    path = Path(secrets_path) if secrets_path else SECRETS_PATH
+    if path.is_file():
+        with open(path, 'rb') as f:
+            settings = tomllib.load(f).get('db_conn', {})
+    elif secrets_path:
+        raise ValueError(f"配置文件不存在: {path}")
+    values = {key: os.environ.get(env, settings.get(key)) for key, env in ENV_MAPPING.items()}
+    return DatabaseConfig(
+        host=values['db_host'],
+        port=values['db_port'],
+        name=values['db_name'],
+        username=values['db_user'],
+        password=values['db_password'],
+    )
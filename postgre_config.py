@@ -1,6 +1,7 @@
-from sqlalchemy import create_engine, Engine
-from sqlalchemy.orm import sessionmaker, Session
+from sqlalchemy import Engine
+from sqlalchemy.orm import Session
 from contextlib import contextmanager
+from engine_registry import get_shared_engine
 
 def get_database_config():
     return DatabaseConfig()
@@ -16,12 +17,13 @@ class DatabaseConfig:
         self.username = "root"
         self.password = "Admin_1"
 
+    # 同一组连接参数在进程内共享一个引擎
     def get_engine(self) -> Engine:
         if not all([self.host, self.port, self.name, self.username, self.password]):
             raise ValueError("数据库连接信息不完整，请检查配置。")
         db_url = f"postgresql+psycopg://{self.username}:{self.password}@{self.host}:{self.port}/{self.name}"
-        engine = create_engine(
-            db_url, 
+        engine = get_shared_engine(
+            db_url,
             pool_size=10,
             max_overflow=20,
             pool_pre_ping=True,
@@ -32,7 +34,7 @@ class DatabaseConfig:
 
     @contextmanager
     def get_session(self, engine: Engine):
-        session = sessionmaker(bind=engine)()
+        session = Session(bind=engine)
         try:
             yield session
         except ValueError as e:
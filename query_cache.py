@@ -0,0 +1,113 @@
+from collections import OrderedDict
+from functools import wraps
+from typing import Any, Callable
+import threading
+import time
+
+
+# 各数据表的缓存有效期（秒），主数据变化很少，可以缓存较长时间
+TABLE_TTL: dict[str, float] = {
+    't_device_type': 3600,
+    't_device_info': 600,
+}
+DEFAULT_TTL = 300
+MAX_ENTRIES = 256
+
+
+class TTLCache:
+    """
+    带过期时间的 LRU 缓存，线程安全
+
+    每个条目记录所属数据表，便于按表失效；超出容量时淘汰最久未使用的条目。
+    """
+    def __init__(self, max_entries: int = MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._data: OrderedDict[tuple, tuple[float, str, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: tuple) -> tuple[bool, Any]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return False, None
+            expires_at, _, value = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                self.misses += 1
+                return False, None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return True, value
+
+    def set(self, key: tuple, value: Any, table: str, ttl: float) -> None:
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, table, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    # 按表失效，table 为空时清空全部
+    def invalidate(self, table: str | None = None) -> int:
+        with self._lock:
+            if table is None:
+                removed = len(self._data)
+                self._data.clear()
+                return removed
+            keys = [k for k, (_, t, _) in self._data.items() if t == table]
+            for k in keys:
+                del self._data[k]
+            return len(keys)
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                'entries': len(self._data),
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
+
+
+_cache = TTLCache()
+
+# 以连接参数区分不同数据库，避免多库之间串数据
+def _config_key(database_config: Any) -> tuple:
+    attrs = ('host', 'port', 'name')
+    if all(hasattr(database_config, a) for a in attrs):
+        return tuple(getattr(database_config, a) for a in attrs)
+    return (id(database_config),)
+
+def cached_query(table: str, ttl: float | None = None) -> Callable:
+    """
+    查询结果缓存装饰器，被装饰函数的第一个参数必须是数据库配置
+
+    Args:
+        table: 结果所依赖的数据表，用于确定 TTL 和按表失效
+        ttl: 自定义有效期（秒），默认取 TABLE_TTL 中的配置
+    """
+    def decorator(func: Callable) -> Callable:
+        @wraps(func)
+        def wrapper(database_config, *args, **kwargs):
+            key = (func.__qualname__, _config_key(database_config), args, tuple(sorted(kwargs.items())))
+            found, value = _cache.get(key)
+            if not found:
+                value = func(database_config, *args, **kwargs)
+                if value is None:
+                    return value
+                _cache.set(key, value, table, ttl if ttl is not None else TABLE_TTL.get(table, DEFAULT_TTL))
+            # 返回副本，防止调用方修改缓存中的对象
+            return value.copy() if hasattr(value, 'copy') else value
+        return wrapper
+    return decorator
+
+# 数据表内容变更后调用，使相关缓存立即失效
+def invalidate(table: str | None = None) -> int:
+    return _cache.invalidate(table)
+
+def get_cache_stats() -> dict[str, int]:
+    return _cache.stats()
@@ -1,13 +1,35 @@
 import pandas as pd
 from openpyxl import Workbook
-from openpyxl.styles import Font, Alignment, Border, Side, PatternFill
+from report_styles import get_style_registry
+from report_writer import ReportWriter, create_report_writer
+from report_width import ColumnWidthTracker
 from openpyxl.worksheet.worksheet import Worksheet
-from openpyxl.cell import Cell
 from openpyxl.utils.dataframe import dataframe_to_rows
+from openpyxl.utils import get_column_letter
+from openpyxl.worksheet._write_only import WriteOnlyWorksheet
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.worksheet.hyperlink import Hyperlink
 from io import BytesIO
+from pathlib import Path
+from tempfile import SpooledTemporaryFile
+from typing import Any, Callable, Iterable, Iterator
+from itertools import islice
+import re
+import zipfile
+from clean_data import TQReportData
+from report_layout import LayoutPlan, SectionPlan, get_layout_plan, render_section_rows, resolve_cell_value
+from report_template_file import TEMPLATE_FILE_MAPPING, get_template_plan
+
+# 流式输出在内存中保留的最大字节数，超过后写入磁盘临时文件
+SPOOL_MAX_SIZE = 8 * 1024 * 1024
+# 流式数据表按前若干行估算自动列宽
+AUTO_WIDTH_SAMPLE_ROWS = 200
 
 
 class BaseReport:
+    # 渲染逻辑变化导致输出不同时递增，已缓存的报表随之失效
+    GENERATOR_VERSION = 1
+
     def __init__(self):
         self.workbook_name = '' # 文件名
         self.worksheet_name = '' # 工作表名
@@ -15,180 +37,305 @@ class BaseReport:
         self.color = '000000' # 字体、边框颜色
         self.name = '宋体'
         self.title = '' # 报表标题
-        # 标题样式
-        self.title_font = Font(name=self.name, size=18, bold=True, color=self.color)
-        # 表头及小标题样式
-        self.header_font = Font(name=self.name, size=11, bold=True, color=self.color)
-        # 数据样式
-        self.data_font = Font(name=self.name, size=11, bold=False, color=self.color)
-        # 对齐
-        self.center_align = Alignment(horizontal='center', vertical='center')
-        # 边框
-        self.border = Border(
-            left=Side(style='thin', color=self.color),
-            right=Side(style='thin', color=self.color),
-            top=Side(style='thin', color=self.color),
-            bottom=Side(style='thin', color=self.color)
-        )
+        # 命名样式注册表，进程内共享，标题/小标题/数据单元格按名称引用样式
+        self.styles = get_style_registry(self.name, self.color)
         self.column_num = 1
+        # 列宽策略：'fixed' 统一列宽，'auto' 按写入内容自动计算
+        self.width_strategy = 'fixed'
         # self.workbook = Workbook()
         # self.worksheet = self.workbook.active
-        # 添加填充色
-        self.title_fill = PatternFill(fill_type=None)
-        self.header_fill = PatternFill(fill_type=None)
 
     def _create_workbook(self) -> tuple[Workbook, Worksheet]:
         workbook = Workbook()
+        self.styles.register(workbook)
         worksheet = workbook.active
         # 这句其实没啥用，主要是为了消除类型注解报错
         if worksheet is None:
             worksheet = workbook.create_sheet()
         return (workbook, worksheet)
 
+    # 创建写出后端，backend 为空时使用默认的 openpyxl
+    def _create_writer(self, backend: str | None = None) -> ReportWriter:
+        return create_report_writer(backend, self.styles, self.worksheet_name or None)
+
     # 添加报表标题
-    def _add_title(self, ws: Worksheet) -> int:
-        # 设置待合并单元格边框
-        # for row in ws.iter_rows(min_row=1, max_row=1, min_col=1, max_col=self.column_num):
-        #     for cell in row:
-        #         cell.border = self.border
-        for cell in ws[1][0:self.column_num]:
-            cell.border = self.border
-        ws.merge_cells(start_row=1, end_row=1, start_column=1, end_column=self.column_num)
-        title_cell: Cell = ws['A1']
-        title_cell.value = self.title
-        title_cell.font = self.title_font
-        title_cell.fill = self.title_fill
-        title_cell.alignment = self.center_align
+    def _add_title(self, writer: ReportWriter) -> int:
+        writer.merge_row(1, 1, self.column_num, self.title, self.styles.title)
         return 2  # 返回下一行的位置
 
     # 添加小标题
-    def _add_header_title(self, ws: Worksheet, header_title: str, start_row: int) -> int:
-        current_row = start_row
-        # for row in ws.iter_rows(min_row=current_row, max_row=current_row, min_col=1, max_col=self.column_num):
-        #     for cell in row:
-        #         cell.border = self.border
-        for cell in ws[current_row][0:self.column_num]:
-            cell.border = self.border
-        ws.merge_cells(start_row=current_row, end_row=current_row, start_column=1, end_column=self.column_num)
-        header_cell: Cell = ws[f'A{current_row}']
-        header_cell.value = header_title
-        header_cell.font = self.header_font
-        header_cell.fill = self.header_fill
-        header_cell.alignment = self.center_align
-        return current_row + 1
+    def _add_header_title(self, writer: ReportWriter, header_title: str, start_row: int) -> int:
+        writer.merge_row(start_row, 1, self.column_num, header_title, self.styles.header)
+        return start_row + 1
 
     # 添加表头尾内容，注意这里直接用dataframe批量写入了，没做任何判断
-    def _add_header_footer_info(self, ws: Worksheet, header_footer_data: pd.DataFrame, start_row: int) -> int:
-        current_row = start_row
+    def _add_header_footer_info(self, writer: ReportWriter, header_footer_data: pd.DataFrame, start_row: int) -> int:
         if header_footer_data is None or header_footer_data.empty:
-            return current_row
-        rows_cnt, cols_cnt = header_footer_data.shape
+            return start_row
         rows = dataframe_to_rows(header_footer_data, index=False, header=False)
-        for row in rows:
-            ws.append(row)
-        last_row = current_row + rows_cnt - 1
-        for row in ws.iter_rows(min_row=current_row, max_row=last_row, min_col=1, max_col=cols_cnt):
-            for cell in row:
-                cell.font = self.header_font
-                cell.fill = self.header_fill
-                cell.border = self.border
-                cell.alignment = self.center_align
-        return last_row + 1
-    
+        return self._add_rows(writer, rows, start_row, self.styles.header)
+
     # 添加报表数据
-    def _add_data(self, ws: Worksheet, data: pd.DataFrame, start_row: int) -> int:
-        current_row = start_row
+    def _add_data(self, writer: ReportWriter, data: pd.DataFrame, start_row: int) -> int:
         if data is None or data.empty:
-            return current_row
-        rows_cnt, cols_cnt = data.shape
+            return start_row
         rows = dataframe_to_rows(data, index=False, header=False)
+        return self._add_rows(writer, rows, start_row, self.styles.data)
+
+    # 按行写入二维字符串表，写入时直接设置样式，不再二次遍历
+    def _add_rows(self, writer: ReportWriter, rows: Iterable[Iterable], start_row: int, style: str) -> int:
+        current_row = start_row
+        for row in rows:
+            writer.write_row(current_row, row, style)
+            current_row += 1
+        return current_row
+
+    # 按编译好的布局计划直接从报表数据写入单元格
+    def _add_layout_plan(self, writer: ReportWriter, plan: LayoutPlan, record, start_row: int,
+                         dynamic_values: dict[str, str] | None = None) -> int:
+        current_row = start_row
+        dynamic_values = dict(dynamic_values or {})
+        for section in plan.sections:
+            rows = render_section_rows(section, record, dynamic_values)
+            if section.part == 'header':
+                current_row = self._add_rows(writer, rows, current_row, self.styles.header)
+            elif section.part == 'footer':
+                current_row = self._add_header_title(writer, section.title, current_row)
+                current_row = self._add_rows(writer, rows, current_row, self.styles.header)
+            else:
+                current_row = self._add_header_title(writer, section.title, current_row)
+                current_row = self._add_rows(writer, rows, current_row, self.styles.data)
+        return current_row
+
+    # ---------- 只写模式（流式）渲染 ----------
+    # 只写模式下行按顺序写出即落盘，单元格样式必须在写出前设置，列宽必须在写第一行之前设置
+
+    def _create_write_only_workbook(self) -> Workbook:
+        workbook = Workbook(write_only=True)
+        self.styles.register(workbook)
+        return workbook
+
+    def _styled_cell(self, ws: WriteOnlyWorksheet, value, style: str) -> WriteOnlyCell:
+        cell = WriteOnlyCell(ws, value=value)
+        cell.style = self.styles.style_for(style, value)
+        return cell
+
+    # 写出一整行合并单元格（标题、小标题）
+    def _stream_merged_row(self, ws: WriteOnlyWorksheet, value: str, row_idx: int, style: str) -> int:
+        row = [self._styled_cell(ws, value, style)]
+        row.extend(self._styled_cell(ws, None, style) for _ in range(self.column_num - 1))
+        ws.append(row)
+        if self.column_num > 1:
+            ws.merged_cells.add(f"A{row_idx}:{get_column_letter(self.column_num)}{row_idx}")
+        return row_idx + 1
+
+    def _stream_title(self, ws: WriteOnlyWorksheet) -> int:
+        return self._stream_merged_row(ws, self.title, 1, self.styles.title)
+
+    def _stream_header_title(self, ws: WriteOnlyWorksheet, header_title: str, start_row: int) -> int:
+        return self._stream_merged_row(ws, header_title, start_row, self.styles.header)
+
+    def _stream_rows(self, ws: WriteOnlyWorksheet, rows: Iterable[Iterable], start_row: int, style: str) -> int:
+        current_row = start_row
         for row in rows:
-            ws.append(row)
-        last_row = current_row + rows_cnt - 1
-        for row in ws.iter_rows(min_row=current_row, max_row=last_row, min_col=1, max_col=cols_cnt):
-            for cell in row:
-                cell.font = self.data_font
-                cell.border = self.border
-                cell.alignment = self.center_align
-        return last_row + 1
-    
-    def _adjust_column_widths(self, ws: Worksheet, strategy: str = 'fixed', custom_width: int = 0) -> None:
+            ws.append([self._styled_cell(ws, value, style) for value in row])
+            current_row += 1
+        return current_row
+
+    # 各段先填成二维表再写出，只写模式下列宽要在写第一行前确定，报表行数很少，整表渲染后再写不占多少内存
+    @staticmethod
+    def _render_layout_plan(plan: LayoutPlan, record) -> list[tuple[SectionPlan, list[list[str]]]]:
+        dynamic_values: dict[str, str] = {}
+        return [(section, render_section_rows(section, record, dynamic_values)) for section in plan.sections]
+
+    def _stream_layout_plan(self, ws: WriteOnlyWorksheet, sections: list[tuple[SectionPlan, list[list[str]]]],
+                            start_row: int) -> int:
+        current_row = start_row
+        for section, rows in sections:
+            if section.part == 'header':
+                current_row = self._stream_rows(ws, rows, current_row, self.styles.header)
+            elif section.part == 'footer':
+                current_row = self._stream_header_title(ws, section.title, current_row)
+                current_row = self._stream_rows(ws, rows, current_row, self.styles.header)
+            else:
+                current_row = self._stream_header_title(ws, section.title, current_row)
+                current_row = self._stream_rows(ws, rows, current_row, self.styles.data)
+        return current_row
+
+    # 时序数据等大数据量工作表：逐行写出，内存占用与行数无关
+    # 只写模式下列宽必须在写出第一行前确定，按表头和前 AUTO_WIDTH_SAMPLE_ROWS 行估算列宽
+    def _stream_data_sheet(self, wb: Workbook, sheet_title: str, columns: list[str], rows: Iterable[Iterable]) -> None:
+        ws = wb.create_sheet(title=sheet_title)
+        rows = iter(rows)
+        sample = [list(row) for row in islice(rows, AUTO_WIDTH_SAMPLE_ROWS)]
+        tracker = ColumnWidthTracker()
+        tracker.update_row(columns)
+        for row in sample:
+            tracker.update_row(row)
+        for col, width in tracker.column_widths(len(columns)).items():
+            self._set_column_width(ws, col, width)
+        ws.append([self._styled_cell(ws, column, self.styles.header) for column in columns])
+        current_row = self._stream_rows(ws, sample, 2, self.styles.data)
+        self._stream_rows(ws, rows, current_row, self.styles.data)
+
+    # 保存到临时文件，超过 max_size 后自动落盘
+    def _save_spooled(self, wb: Workbook, max_size: int = SPOOL_MAX_SIZE) -> SpooledTemporaryFile:
+        output = SpooledTemporaryFile(max_size=max_size, suffix='.xlsx')
+        wb.save(output)
+        output.seek(0)
+        return output
+
+    def _adjust_column_widths(self, ws: Worksheet | ReportWriter, strategy: str = 'fixed', custom_width: int = 0,
+                              tracker: ColumnWidthTracker | None = None) -> None:
         """
         调整工作表列宽
-        
+
         Args:
-            ws: 工作表对象
-            strategy: 调整策略 ('auto', 'custom', 'fixed')
-            min_width: 最小列宽
-            max_width: 最大列宽  
-            custom_widths: 自定义列宽字典，如 {'A': 15, 'B': 20}
+            ws: 工作表对象或写出后端
+            strategy: 调整策略 ('auto', 'fixed')
+            custom_width: 固定列宽，默认 20
+            tracker: 自动列宽使用的宽度记录，缺省时取写出后端写入过程中记录的宽度
         """
         try:
-            # if strategy == 'custom' and custom_width:
-            #     # 使用自定义列宽
-            #     for column_letter, width in custom_widths.items():
-            #         ws.column_dimensions[column_letter].width = width
-            
-            # elif strategy == 'fixed':
+            if strategy == 'auto':
+                # 自动列宽：按写入时记录的每列最大显示宽度设置，不再遍历单元格
+                if tracker is None:
+                    tracker = ws.width_tracker if isinstance(ws, ReportWriter) else ColumnWidthTracker()
+                for col, width in tracker.column_widths(self.column_num).items():
+                    self._set_column_width(ws, col, width)
+            else:
                 # 固定列宽
-            default_width = custom_width if custom_width > 0 else 20
-            for i in range(1, self.column_num + 1):
-                column_letter = chr(64 + i)
-                ws.column_dimensions[column_letter].width = default_width
-            
-            # else:  # 'auto' - 自动计算
-            #     for column in ws.columns:
-            #         max_length = 0
-            #         column_letter = column[0].column_letter
-                    
-            #         for cell in column:
-            #             if cell.value:
-            #                 # 计算内容长度，考虑中文字符
-            #                 content = str(cell.value)
-            #                 # 中文字符计算（占用更多空间）
-            #                 chinese_chars = len([c for c in content if '\u4e00' <= c <= '\u9fff'])
-            #                 length = len(content) + chinese_chars * 0.5
-                            
-            #                 max_length = max(max_length, length)
-                    
-            #         # 应用最小和最大宽度限制
-            #         adjusted_width = max(min_width, min(max_length + 2, max_width))
-            #         ws.column_dimensions[column_letter].width = adjusted_width
-                    
-        except:
+                default_width = custom_width if custom_width > 0 else 20
+                for i in range(1, self.column_num + 1):
+                    self._set_column_width(ws, i, default_width)
+        except Exception:
             # 异常处理：设置默认列宽
             for i in range(1, self.column_num + 1):
-                column_letter = chr(64 + i)
-                ws.column_dimensions[column_letter].width = 20
+                self._set_column_width(ws, i, 20)
+
+    # 只写模式的工作表直接设置列宽，其余通过写出后端设置
+    @staticmethod
+    def _set_column_width(ws: Worksheet | ReportWriter, col: int, width: float) -> None:
+        if isinstance(ws, ReportWriter):
+            ws.set_column_width(col, width)
+        else:
+            ws.column_dimensions[get_column_letter(col)].width = width
 
 
 class TQReportGenerator(BaseReport):
+    TABLE_NAME = 't_tq_batch_archive'
+    RECORD_CLASS = TQReportData
+
     def __init__(self):
         super().__init__()
-    def generate_report(self, device_name: str, report_data: dict[str, list[pd.DataFrame]]) -> bytes:
+
+    def _report_title(self, device_name: str | None) -> str:
+        return f"提取车间自控报表--{device_name}"
+
+    def generate_report(self, device_name: str, report_data: dict[str, list[pd.DataFrame]],
+                        backend: str | None = None) -> bytes:
         self.column_num = 6
-        wb, ws = self._create_workbook()
+        writer = self._create_writer(backend)
         self.title = f"提取车间自控报表--{device_name}"
         # 报表标题
-        current_row = self._add_title(ws)
+        current_row = self._add_title(writer)
         # header_info
         header_info = report_data['header'][0]
-        current_row = self._add_header_footer_info(ws, header_info, current_row)
+        current_row = self._add_header_footer_info(writer, header_info, current_row)
         # main_info
         main_info = report_data['main']
         header_title = ['一次参数设置', '一次煎煮记录']
         for title, data in zip(header_title, main_info):
-            current_row = self._add_header_title(ws, title, current_row)
-            current_row = self._add_data(ws, data, current_row)
+            current_row = self._add_header_title(writer, title, current_row)
+            current_row = self._add_data(writer, data, current_row)
         # footer_info
         footer_title = '其他信息'
         footer_info = report_data['footer'][0]
-        current_row = self._add_header_title(ws, footer_title, current_row)
-        self._add_header_footer_info(ws, footer_info, current_row)
+        current_row = self._add_header_title(writer, footer_title, current_row)
+        self._add_header_footer_info(writer, footer_info, current_row)
         # 调整列宽
-        self._adjust_column_widths(ws, custom_width=20)
+        self._adjust_column_widths(writer, self.width_strategy, custom_width=20)
         
         # 保存到内存
+        return writer.save()
+
+    # 由清洗后的报表数据直接生成，不经过中间 DataFrame，dynamic_values 可预先指定报表生成时间等动态值
+    def generate_report_from_record(self, record: TQReportData, dynamic_values: dict[str, str] | None = None,
+                                    backend: str | None = None) -> bytes:
+        plan = get_layout_plan(self.TABLE_NAME, self.RECORD_CLASS)
+        self.column_num = plan.column_num
+        writer = self._create_writer(backend)
+        self.title = self._report_title(record.device_name)
+        current_row = self._add_title(writer)
+        self._add_layout_plan(writer, plan, record, current_row, dynamic_values)
+        self._adjust_column_widths(writer, self.width_strategy, custom_width=20)
+        return writer.save()
+
+    # 只写模式生成，data_sheets 为附加的数据表 {表名: DataFrame 或 (列名, 行迭代器)}，返回已定位到开头的临时文件
+    def generate_report_stream(self, record: TQReportData,
+                               data_sheets: dict[str, pd.DataFrame | tuple[list[str], Iterable[Iterable]]] | None = None) -> SpooledTemporaryFile:
+        wb = self._create_write_only_workbook()
+        self.stream_record_sheet(wb, record, self.worksheet_name or None)
+        for sheet_title, sheet_data in (data_sheets or {}).items():
+            if isinstance(sheet_data, pd.DataFrame):
+                columns = [str(c) for c in sheet_data.columns]
+                rows = sheet_data.itertuples(index=False, name=None)
+            else:
+                columns, rows = sheet_data
+            self._stream_data_sheet(wb, sheet_title, columns, rows)
+        return self._save_spooled(wb)
+
+    # 在只写工作簿中追加一张报表工作表，多批次导出时多张报表共用同一个工作簿
+    def stream_record_sheet(self, wb: Workbook, record: TQReportData, sheet_title: str | None) -> WriteOnlyWorksheet:
+        plan = get_layout_plan(self.TABLE_NAME, self.RECORD_CLASS)
+        self.column_num = plan.column_num
+        self.title = self._report_title(record.device_name)
+        sections = self._render_layout_plan(plan, record)
+        # 自动列宽按渲染好的行记录宽度，与写出后端一致，合并的标题行不参与
+        tracker = None
+        if self.width_strategy == 'auto':
+            tracker = ColumnWidthTracker()
+            for _, rows in sections:
+                for row in rows:
+                    tracker.update_row(row)
+        ws = wb.create_sheet(title=sheet_title)
+        self._adjust_column_widths(ws, self.width_strategy, custom_width=20, tracker=tracker)
+        current_row = self._stream_title(ws)
+        self._stream_layout_plan(ws, sections, current_row)
+        return ws
+
+class TemplateReportGenerator(BaseReport):
+    """
+    按 Excel 模板文件生成报表
+
+    模板按 block_N 区块顺序依次输出，单元格值、样式、合并单元格和行高列宽均取自模板。
+    模板只在首次使用或文件修改后解析一次，生成报表时只按编译好的计划写入单元格。
+    """
+    def __init__(self, template_path: str | Path, record_class: type):
+        super().__init__()
+        self.template_path = template_path
+        self.record_class = record_class
+
+    def generate_report_from_record(self, record, dynamic_values: dict[str, str] | None = None) -> bytes:
+        plan = get_template_plan(self.template_path, self.record_class)
+        wb, ws = self._create_workbook()
+        plan.styles.register(wb)
+        for col, width in plan.column_widths:
+            ws.column_dimensions[get_column_letter(col)].width = width
+        dynamic_values = dict(dynamic_values or {})
+        current_row = 1
+        for block in plan.blocks:
+            for placement in block.cells:
+                value = resolve_cell_value(placement.kind, placement.value, record, dynamic_values)
+                cell = ws.cell(row=current_row + placement.row, column=placement.col, value=value or None)
+                if placement.style:
+                    cell.style = placement.style
+            for r0, c0, r1, c1 in block.merges:
+                ws.merge_cells(start_row=current_row + r0, start_column=c0, end_row=current_row + r1, end_column=c1)
+            for row_offset, height in block.row_heights:
+                ws.row_dimensions[current_row + row_offset].height = height
+            current_row += block.row_count
+
         buffer = BytesIO()
         wb.save(buffer)
         buffer.seek(0)
@@ -196,7 +343,8 @@ class TQReportGenerator(BaseReport):
 
 class ReportGeneratorFactory:
     GENERATOR_MAPPING: dict[str, type] = {
-        "T_TQ_Batch_Archive": TQReportGenerator
+        "T_TQ_Batch_Archive": TQReportGenerator,
+        "t_tq_batch_archive": TQReportGenerator
     }
 
     @classmethod
@@ -207,8 +355,121 @@ class ReportGeneratorFactory:
         else:
             raise ValueError(f"不支持的报表类型: {table_name}")
 
-# 工厂方法，供外部调用
-def get_report(report_data: dict[str, list[pd.DataFrame]], table_name: str, device_name: str) -> bytes:
+# 工厂方法，供外部调用；backend 选择写出后端（'openpyxl' / 'xlsxwriter'），默认 openpyxl
+def get_report(report_data: dict[str, list[pd.DataFrame]], table_name: str, device_name: str,
+               backend: str | None = None) -> bytes:
     generator = ReportGeneratorFactory.create_report_generator(table_name)
-    report = generator.generate_report(device_name, report_data)
+    report = generator.generate_report(device_name, report_data, backend)
     return report
+
+def get_report_from_record(record, table_name: str, dynamic_values: dict[str, str] | None = None,
+                           backend: str | None = None) -> bytes:
+    generator = ReportGeneratorFactory.create_report_generator(table_name)
+    return generator.generate_report_from_record(record, dynamic_values, backend)
+
+# 按模板文件生成，template_path 缺省时使用 TEMPLATE_FILE_MAPPING 中该归档表的模板
+# 单份、打包、多工作表和进程池渲染统一使用内置布局，模板文件只在显式调用本方法时使用，不走报表缓存
+def get_report_from_template(record, table_name: str, template_path: str | Path | None = None,
+                             dynamic_values: dict[str, str] | None = None) -> bytes:
+    generator_class = ReportGeneratorFactory.GENERATOR_MAPPING.get(table_name)
+    if generator_class is None:
+        raise ValueError(f"不支持的报表类型: {table_name}")
+    if template_path is None:
+        template_path = TEMPLATE_FILE_MAPPING.get(generator_class.TABLE_NAME)
+        if template_path is None:
+            raise ValueError(f"报表类型没有配置模板文件: {table_name}")
+    generator = TemplateReportGenerator(template_path, generator_class.RECORD_CLASS)
+    return generator.generate_report_from_record(record, dynamic_values)
+
+def get_report_stream(record, table_name: str, data_sheets: dict | None = None) -> SpooledTemporaryFile:
+    generator = ReportGeneratorFactory.create_report_generator(table_name)
+    return generator.generate_report_stream(record, data_sheets)
+
+# ---------- 多批次导出 ----------
+# Excel 工作表名最长 31 个字符，且不能包含 []:*?/\
+_INVALID_SHEET_CHARS = re.compile(r'[\[\]:*?/\\]')
+_INVALID_FILE_CHARS = re.compile(r'[\\/:*?"<>|]')
+INDEX_SHEET_TITLE = '目录'
+INDEX_COLUMNS = ['序号', '批号', '品名', '设备名称', '开始时间', '结束时间', '工作表']
+
+def get_report_file_name(record) -> str:
+    return f'Batch_Rpt_{record.batch_number}_{record.device_name}.xlsx'
+
+def _unique_name(base: str, used: set[str], max_len: int | None = None, suffix: str = '') -> str:
+    name = base[:max_len - len(suffix)] + suffix if max_len else base + suffix
+    idx = 1
+    while name.lower() in used:
+        tail = f"({idx}){suffix}"
+        name = (base[:max_len - len(tail)] if max_len else base) + tail
+        idx += 1
+    used.add(name.lower())
+    return name
+
+def _sheet_title(record, used: set[str]) -> str:
+    base = _INVALID_SHEET_CHARS.sub('_', f"{record.batch_number}_{record.device_name}")
+    return _unique_name(base, used, max_len=31)
+
+def get_multi_report_stream(items: Iterable[tuple[str, Any]]) -> SpooledTemporaryFile:
+    """
+    多个设备批次报表写入同一个工作簿：首页为目录，之后每个设备批次一张工作表
+
+    Args:
+        items: (归档表名, 清洗后的报表数据) 迭代器，逐个渲染，内存占用不随批次数增长
+    """
+    index_report = BaseReport()
+    wb = index_report._create_write_only_workbook()
+    index_ws = wb.create_sheet(title=INDEX_SHEET_TITLE)
+    for i, width in enumerate([8, 20, 20, 20, 22, 22, 32], start=1):
+        index_ws.column_dimensions[get_column_letter(i)].width = width
+    index_ws.append([index_report._styled_cell(index_ws, c, index_report.styles.header) for c in INDEX_COLUMNS])
+    used_titles = {INDEX_SHEET_TITLE.lower()}
+    generators: dict[str, BaseReport] = {}
+    for seq, (table_name, record) in enumerate(items, start=1):
+        generator = generators.get(table_name)
+        if generator is None:
+            generator = ReportGeneratorFactory.create_report_generator(table_name)
+            generator.styles.register(wb)
+            generators[table_name] = generator
+        sheet_title = _sheet_title(record, used_titles)
+        generator.stream_record_sheet(wb, record, sheet_title)
+        row = [index_report._styled_cell(index_ws, v, index_report.styles.data) for v in (
+            seq, record.batch_number, record.product_name, record.device_name,
+            record.device_batch_start_time, record.device_batch_end_time, sheet_title)]
+        quoted_title = sheet_title.replace("'", "''")
+        row[-1].hyperlink = Hyperlink(ref='', location=f"'{quoted_title}'!A1")
+        index_ws.append(row)
+    return index_report._save_spooled(wb)
+
+# 当前进程内逐个渲染，产出 (报表数据, xlsx 字节串)
+def _render_records(items: Iterable[tuple[str, Any]]) -> Iterator[tuple[Any, bytes]]:
+    generators: dict[str, BaseReport] = {}
+    for table_name, record in items:
+        generator = generators.get(table_name)
+        if generator is None:
+            generator = ReportGeneratorFactory.create_report_generator(table_name)
+            generators[table_name] = generator
+        yield record, generator.generate_report_from_record(record)
+
+# 生成可作为文件名的报表名，去掉非法字符，与 used 中已有的名称重复时追加序号
+def make_report_file_name(record, used: set[str]) -> str:
+    base = _INVALID_FILE_CHARS.sub('_', get_report_file_name(record)[:-len('.xlsx')])
+    return _unique_name(base, used, suffix='.xlsx')
+
+def get_report_zip_stream(items: Iterable[tuple[str, Any]],
+                          render_many: Callable[[Iterable[tuple[str, Any]]], Iterator[tuple[Any, bytes]]] | None = None) -> SpooledTemporaryFile:
+    """
+    多个设备批次报表逐个生成后写入 ZIP，每个设备批次一个 xlsx 文件
+
+    Args:
+        render_many: 批量渲染函数，需按输入顺序产出 (报表数据, xlsx 字节串)，
+                     如 report_service 的多进程渲染，缺省时在当前进程逐个渲染
+    """
+    output = SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE, suffix='.zip')
+    used_names: set[str] = set()
+    rendered = (render_many or _render_records)(items)
+    # xlsx 本身已压缩，ZIP 内直接存储
+    with zipfile.ZipFile(output, 'w', compression=zipfile.ZIP_STORED) as zf:
+        for record, content in rendered:
+            zf.writestr(make_report_file_name(record, used_names), content)
+    output.seek(0)
+    return output
@@ -0,0 +1,223 @@
+from pathlib import Path
+from typing import Any
+import hashlib
+import tempfile
+import threading
+import zipfile
+import io
+import os
+
+from report import ReportGeneratorFactory, get_report_from_record
+from report_layout import DYNAMIC_VALUES, get_layout_plan
+
+
+# 缓存目录与容量上限，可通过环境变量调整
+CACHE_DIR = Path(os.environ.get('REPORT_CACHE_DIR', Path(tempfile.gettempdir()) / 'batch_report_cache'))
+MAX_BYTES = int(os.environ.get('REPORT_CACHE_MAX_BYTES', 512 * 1024 * 1024))
+
+# 缓存的报表中动态值（报表生成时间）先写入占位符，取出时再替换为当前值
+DYNAMIC_PLACEHOLDERS: dict[str, str] = {
+    expr: f'__REPORT_DYNAMIC_{i}__' for i, expr in enumerate(DYNAMIC_VALUES)
+}
+# 字符串可能写在共享字符串表，也可能以内联字符串写在工作表中（取决于 openpyxl 版本）
+_STRING_PARTS = ('xl/sharedStrings.xml', 'xl/worksheets/')
+# 缓存文件格式版本，计入缓存键，格式变化后旧文件不再命中
+CACHE_FORMAT_VERSION = 2
+
+
+class ReportArtifactCache:
+    """
+    已结束批次报表的磁盘缓存
+
+    批次结束后归档数据不再变化，同一设备批次在模板和生成器版本不变时生成的 xlsx 相同。
+    缓存键由 (归档表, device_batch_id, 设备名称, 产品名称, 模板指纹, 生成器版本) 计算，设备或产品改名后重新生成；
+    文件按最近访问时间做 LRU 淘汰。多个进程共用缓存目录，每次写入后按目录实际大小淘汰，总大小不超过 max_bytes。
+    缓存文件中含动态值占位符的部件排在最后，命中时只重写这些部件，其余部件的压缩数据原样复用。
+    """
+    def __init__(self, cache_dir: str | Path = CACHE_DIR, max_bytes: int = MAX_BYTES):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    # 批次已结束才缓存，进行中的批次数据还会变化
+    @staticmethod
+    def is_cacheable(record: Any) -> bool:
+        return getattr(record, 'device_batch_id', None) is not None and bool(getattr(record, 'device_batch_end_time', None))
+
+    def _key(self, table_name: str, record: Any) -> str:
+        generator = ReportGeneratorFactory.create_report_generator(table_name)
+        plan = get_layout_plan(generator.TABLE_NAME, generator.RECORD_CLASS)
+        # 设备名称、产品名称取自主数据而非归档行，改名后缓存的标题会过期，需要计入缓存键
+        raw = (f"{generator.TABLE_NAME}|{record.device_batch_id}|{getattr(record, 'device_name', '')}|"
+               f"{getattr(record, 'product_name', '')}|{plan.fingerprint}|{generator.GENERATOR_VERSION}|{CACHE_FORMAT_VERSION}")
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.xlsx"
+
+    def get(self, table_name: str, record: Any) -> bytes | None:
+        """
+        读取缓存的报表，动态值替换为当前值；未缓存或批次未结束返回 None
+        """
+        if not self.is_cacheable(record):
+            return None
+        return self._read(self._path(self._key(table_name, record)))
+
+    def _read(self, path: Path) -> bytes | None:
+        try:
+            content = path.read_bytes()
+            # 更新修改时间作为最近访问时间
+            os.utime(path)
+        except OSError:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return fill_dynamic_values(content)
+
+    def get_or_render(self, table_name: str, record: Any) -> bytes:
+        """
+        优先返回缓存，未命中时生成并写入缓存；批次未结束时直接生成
+        """
+        if not self.is_cacheable(record):
+            return get_report_from_record(record, table_name)
+        path = self._path(self._key(table_name, record))
+        content = self._read(path)
+        if content is not None:
+            return content
+        template = pack_dynamic_parts(get_report_from_record(record, table_name, DYNAMIC_PLACEHOLDERS))
+        self._put(path, template)
+        return fill_dynamic_values(template)
+
+    def _put(self, path: Path, content: bytes) -> None:
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            # 先写临时文件再替换，多个进程同时写同一报表也不会读到半个文件
+            with tempfile.NamedTemporaryFile(dir=self.cache_dir, suffix='.tmp', delete=False) as f:
+                f.write(content)
+            os.replace(f.name, path)
+        except OSError as e:
+            print(f"报表缓存写入失败: {e}")
+            return
+        with self._lock:
+            self._evict()
+
+    # 缓存目录中的报表文件 [(修改时间, 大小, 路径)]
+    def _scan(self) -> list[tuple[float, int, Path]]:
+        entries = []
+        try:
+            with os.scandir(self.cache_dir) as it:
+                for entry in it:
+                    if not entry.name.endswith('.xlsx'):
+                        continue
+                    try:
+                        stat = entry.stat()
+                    except OSError:
+                        continue
+                    entries.append((stat.st_mtime, stat.st_size, Path(entry.path)))
+        except OSError:
+            pass
+        return entries
+
+    # 超出容量时按修改时间从旧到新删除；其他进程也会写入，总大小每次都以目录实际内容为准
+    def _evict(self) -> None:
+        entries = self._scan()
+        total = sum(size for _, size, _ in entries)
+        if total <= self.max_bytes:
+            return
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                path.unlink()
+            except OSError:
+                continue
+            total -= size
+            self.evictions += 1
+
+    def clear(self) -> int:
+        removed = 0
+        with self._lock:
+            for path in self.cache_dir.glob('*.xlsx'):
+                try:
+                    path.unlink()
+                    removed += 1
+                except OSError:
+                    continue
+        return removed
+
+    def stats(self) -> dict[str, int]:
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+        }
+
+
+def pack_dynamic_parts(content: bytes) -> bytes:
+    """
+    把含动态值占位符的部件移到压缩包末尾，部件名记录在 ZIP 注释中，写入缓存前调用一次
+    """
+    markers = [placeholder.encode('utf-8') for placeholder in DYNAMIC_PLACEHOLDERS.values()]
+    with zipfile.ZipFile(io.BytesIO(content)) as source:
+        parts = [(info, source.read(info)) for info in source.infolist()]
+    dynamic = [info.filename for info, data in parts
+               if info.filename.startswith(_STRING_PARTS) and any(marker in data for marker in markers)]
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_DEFLATED) as target:
+        for info, data in sorted(parts, key=lambda part: part[0].filename in dynamic):
+            target.writestr(info, data)
+        target.comment = '\n'.join(dynamic).encode('utf-8')
+    return buffer.getvalue()
+
+def fill_dynamic_values(content: bytes) -> bytes:
+    """
+    将缓存报表中的动态值占位符替换为当前值
+
+    content 为 pack_dynamic_parts 的结果。末尾含占位符的部件解压替换后重新写入，
+    之前的部件连同压缩数据按字节原样复制，只在新的中央目录中登记，不重新解压和压缩。
+    """
+    with zipfile.ZipFile(io.BytesIO(content)) as source:
+        dynamic = set(filter(None, source.comment.decode('utf-8').split('\n')))
+        if not dynamic:
+            return content
+        infos = source.infolist()
+        static = [info for info in infos if info.filename not in dynamic]
+        patched = []
+        for info in infos:
+            if info.filename in dynamic:
+                data = source.read(info)
+                for expr, placeholder in DYNAMIC_PLACEHOLDERS.items():
+                    marker = placeholder.encode('utf-8')
+                    if marker in data:
+                        data = data.replace(marker, DYNAMIC_VALUES[expr]().encode('utf-8'))
+                patched.append((info, data))
+    offset = min(info.header_offset for info, _ in patched)
+    buffer = io.BytesIO()
+    buffer.write(memoryview(content)[:offset])
+    # ZipFile 从缓冲区当前位置开始写，已复制部件的本地文件头偏移不变，直接加入中央目录
+    with zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_DEFLATED) as target:
+        for info in static:
+            target.filelist.append(info)
+            target.NameToInfo[info.filename] = info
+        for info, data in patched:
+            target.writestr(info, data)
+    return buffer.getvalue()
+
+
+_cache: ReportArtifactCache | None = None
+_cache_lock = threading.Lock()
+
+def get_report_cache() -> ReportArtifactCache:
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ReportArtifactCache()
+        return _cache
+
+# 工厂方法，供外部调用：已结束批次走磁盘缓存
+def get_cached_report(record: Any, table_name: str) -> bytes:
+    return get_report_cache().get_or_render(table_name, record)
@@ -0,0 +1,163 @@
+from dataclasses import dataclass, fields
+from datetime import datetime
+from typing import Any, Callable
+import string
+from openpyxl.utils import column_index_from_string, get_column_letter
+import hashlib
+import json
+import threading
+
+from Report_Template.report_template import TQ_REPORT_TEMPLATE
+
+
+# 模板中需要在生成时计算的值，now_time 为 Excel 模板文件中的写法
+DYNAMIC_VALUES: dict[str, Callable[[], str]] = {
+    "datetime.now().strftime('%Y-%m-%d %H:%M:%S')": lambda: datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+    "now_time": lambda: datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+}
+
+# 单元格取值方式
+LITERAL = 0
+FIELD = 1
+DYNAMIC = 2
+FORMAT = 3          # 含 {字段名} 的字符串，如 '提取车间自控报表--{device_name}'
+
+
+@dataclass(frozen=True, slots=True)
+class CellPlacement:
+    row: int            # 段内行号，从 0 开始
+    col: int            # 列号，从 1 开始
+    kind: int           # LITERAL / FIELD / DYNAMIC / FORMAT
+    value: str          # 字面值、字段名、动态值表达式或含 {字段名} 的格式字符串
+
+@dataclass(frozen=True, slots=True)
+class SectionPlan:
+    part: str           # 'header' / 'body' / 'footer'
+    title: str
+    row_count: int
+    column_count: int
+    cells: tuple[CellPlacement, ...]
+
+@dataclass(frozen=True, slots=True)
+class LayoutPlan:
+    title: str
+    column_num: int
+    sections: tuple[SectionPlan, ...]
+    fingerprint: str
+
+
+REPORT_TEMPLATE_MAPPING: dict[str, dict] = {
+    't_tq_batch_archive': TQ_REPORT_TEMPLATE,
+}
+
+# (归档表名, 报表数据类) -> (编译时的模板对象, 计划)
+_plans: dict[tuple[str, type], tuple[dict, LayoutPlan]] = {}
+_lock = threading.Lock()
+
+
+def _template_fingerprint(template: dict) -> str:
+    return hashlib.sha1(json.dumps(template, ensure_ascii=False, sort_keys=True).encode("utf-8")).hexdigest()
+
+_formatter = string.Formatter()
+
+# 判断模板中的字符串按哪种方式取值
+def classify_cell_value(value: str, record_fields: set[str]) -> int:
+    if value in DYNAMIC_VALUES:
+        return DYNAMIC
+    if value in record_fields:
+        return FIELD
+    if '{' in value:
+        try:
+            names = {name for _, name, _, _ in _formatter.parse(value) if name}
+        except ValueError:
+            return LITERAL
+        if names and names <= record_fields:
+            return FORMAT
+    return LITERAL
+
+def compile_layout_plan(template: dict, record_class: type) -> LayoutPlan:
+    """
+    将声明式报表模板编译为单元格放置计划
+
+    模板中的字符串若是报表数据类的字段名则按字段取值，若在 DYNAMIC_VALUES 中则在生成时计算，其余按字面值输出。
+    """
+    record_fields = {f.name for f in fields(record_class)}
+    sections = []
+    column_num = 0
+    for part in ("header", "body", "footer"):
+        for title, rows in template.get(part, {}).items():
+            cells = []
+            column_count = 0
+            for row_idx, row in enumerate(rows):
+                for letter, value in row.items():
+                    col = column_index_from_string(letter)
+                    column_count = max(column_count, col)
+                    cells.append(CellPlacement(row_idx, col, classify_cell_value(value, record_fields), value))
+            column_num = max(column_num, column_count)
+            sections.append(SectionPlan(part, title, len(rows), column_count, tuple(cells)))
+    return LayoutPlan(template.get("title", ""), column_num, tuple(sections), _template_fingerprint(template))
+
+# 获取编译好的计划，按模板对象判断是否需要重新编译，指纹只在编译时计算一次
+# REPORT_TEMPLATE_MAPPING 中的模板被替换为新的字典时自动重新编译；原地修改模板后需调用 invalidate_layout_plans
+def get_layout_plan(table_name: str, record_class: type) -> LayoutPlan:
+    template = REPORT_TEMPLATE_MAPPING.get(table_name)
+    if template is None:
+        raise ValueError(f"不支持的报表类型: {table_name}")
+    key = (table_name, record_class)
+    cached = _plans.get(key)
+    if cached is not None and cached[0] is template:
+        return cached[1]
+    with _lock:
+        cached = _plans.get(key)
+        if cached is None or cached[0] is not template:
+            cached = (template, compile_layout_plan(template, record_class))
+            _plans[key] = cached
+    return cached[1]
+
+def invalidate_layout_plans() -> None:
+    with _lock:
+        _plans.clear()
+
+def format_cell_value(value: Any) -> str:
+    return '' if value is None else str(value)
+
+def resolve_cell_value(kind: int, value: str, record: Any, dynamic_values: dict[str, str]) -> str:
+    """
+    按取值方式计算单元格的值，动态值计算后存入 dynamic_values，同一份报表内只计算一次
+    """
+    if kind == FIELD:
+        return format_cell_value(getattr(record, value))
+    if kind == DYNAMIC:
+        if value not in dynamic_values:
+            dynamic_values[value] = DYNAMIC_VALUES[value]()
+        return dynamic_values[value]
+    if kind == FORMAT:
+        return _formatter.vformat(value, (), _RecordFields(record))
+    return value
+
+# 供 str.format 按名称取报表数据字段，None 输出为空字符串
+class _RecordFields:
+    __slots__ = ('record',)
+
+    def __init__(self, record: Any):
+        self.record = record
+
+    def __getitem__(self, name: str) -> str:
+        return format_cell_value(getattr(self.record, name))
+
+def render_section_rows(section: SectionPlan, record: Any, dynamic_values: dict[str, str] | None = None) -> list[list[str]]:
+    """
+    按计划把报表数据直接填入二维字符串表，未放置的单元格为空字符串
+
+    Args:
+        dynamic_values: 已计算好的动态值，同一份报表内各段共用，缺省时按需计算
+    """
+    rows = [[''] * section.column_count for _ in range(section.row_count)]
+    if dynamic_values is None:
+        dynamic_values = {}
+    for cell in section.cells:
+        rows[cell.row][cell.col - 1] = resolve_cell_value(cell.kind, cell.value, record, dynamic_values)
+    return rows
+
+def column_letters(column_count: int) -> list[str]:
+    return [get_column_letter(i) for i in range(1, column_count + 1)]
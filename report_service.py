@@ -0,0 +1,210 @@
+from concurrent.futures import Future, ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from collections import deque
+from pathlib import Path
+from typing import Any, Iterable, Iterator
+import multiprocessing
+import threading
+import atexit
+import pickle
+import time
+import os
+
+from report_cache import get_cached_report
+
+LATENCY_HISTORY = 10000
+
+
+# 子进程中执行的渲染函数，必须是模块级函数才能被序列化；已结束批次走磁盘缓存
+def _render_report(table_name: str, record: Any) -> bytes:
+    return get_cached_report(record, table_name)
+
+def _render_report_to_file(table_name: str, record: Any, file_path: str) -> str:
+    Path(file_path).write_bytes(get_cached_report(record, table_name))
+    return file_path
+
+
+class ReportRenderService:
+    """
+    多进程报表渲染服务
+
+    openpyxl 渲染是纯 Python 的 CPU 密集操作，放到进程池中执行以绕开 GIL。
+    排队任务数有上限，提交超过上限时阻塞等待，最多等待 task_timeout 秒；
+    进程池不可用（创建失败、子进程崩溃、提交时数据无法序列化、排队名额等待超时）时退回当前进程渲染。
+    子进程中的渲染异常原样抛出，不会退回当前进程重试。
+    """
+    def __init__(self, max_workers: int | None = None, max_pending: int | None = None, task_timeout: float = 60):
+        self.max_workers = max_workers or max(1, (os.cpu_count() or 1) - 1)
+        self.max_pending = max_pending or self.max_workers * 2
+        self.task_timeout = task_timeout
+        self._executor: ProcessPoolExecutor | None = None
+        self._pending = threading.BoundedSemaphore(self.max_pending)
+        self._lock = threading.Lock()
+        # 单进程配置是有意不用进程池，不计入退回次数
+        self._single_process = self.max_workers <= 1
+        self._disabled = self._single_process
+        # 进程池本应可用却退回当前进程渲染的次数（创建失败、子进程崩溃、数据无法序列化、排队名额等待超时）
+        self.fallback_count = 0
+        self.failed_count = 0
+        # 最近完成任务的耗时（秒）：子进程任务从提交到子进程完成，不含排在前面的任务造成的等待；当前进程渲染为渲染本身的耗时
+        self.latencies: deque[float] = deque(maxlen=LATENCY_HISTORY)
+
+    def _get_executor(self) -> ProcessPoolExecutor | None:
+        if self._disabled:
+            return None
+        with self._lock:
+            if self._executor is None:
+                try:
+                    # Streamlit 服务进程是多线程的，使用 spawn 避免 fork 带来的锁状态问题
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.max_workers,
+                        mp_context=multiprocessing.get_context("spawn")
+                    )
+                except (OSError, ValueError, NotImplementedError) as e:
+                    print(f"报表进程池创建失败，改为当前进程渲染: {e}")
+                    self._disabled = True
+            return self._executor
+
+    # 子进程崩溃后进程池不可再用，丢弃后下次提交时重建
+    def _reset_executor(self) -> None:
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+    def _render_in_process(self, table_name: str, record: Any, file_path: str | None) -> bytes | str:
+        started_at = time.perf_counter()
+        if file_path:
+            result = _render_report_to_file(table_name, record, file_path)
+        else:
+            result = _render_report(table_name, record)
+        self.latencies.append(time.perf_counter() - started_at)
+        return result
+
+    # 任务完成时在进程池的管理线程中调用：释放排队名额，成功的任务记录从提交到完成的耗时
+    def _on_done(self, future: Future, submitted_at: float) -> None:
+        self._pending.release()
+        if not future.cancelled() and future.exception() is None:
+            self.latencies.append(time.perf_counter() - submitted_at)
+
+    def submit(self, table_name: str, record: Any, file_path: str | None = None) -> Future | None:
+        """
+        提交渲染任务，排队任务已满时阻塞，最多等待 task_timeout 秒；进程池不可用时返回 None
+        """
+        executor = self._get_executor()
+        if executor is None:
+            if not self._single_process:
+                self.fallback_count += 1
+            return None
+        # 进程池在后台线程中序列化参数，错误只会出现在结果里；提交前先检查，无法序列化的数据直接在当前进程渲染
+        try:
+            pickle.dumps((table_name, record, file_path))
+        except (pickle.PicklingError, TypeError, AttributeError) as e:
+            print(f"报表数据无法传入子进程，改为当前进程渲染: {e}")
+            self.fallback_count += 1
+            return None
+        # 超时后仍在运行的任务会一直占用名额，等待有上限，名额迟迟不释放时改为当前进程渲染
+        if not self._pending.acquire(timeout=self.task_timeout):
+            print(f"报表进程池排队名额等待超时（{self.task_timeout}s），改为当前进程渲染")
+            self.fallback_count += 1
+            return None
+        submitted_at = time.perf_counter()
+        try:
+            if file_path:
+                future = executor.submit(_render_report_to_file, table_name, record, file_path)
+            else:
+                future = executor.submit(_render_report, table_name, record)
+        except (BrokenProcessPool, RuntimeError) as e:
+            self._pending.release()
+            print(f"报表进程池不可用，改为当前进程渲染: {e}")
+            self._reset_executor()
+            self.fallback_count += 1
+            return None
+        future.add_done_callback(lambda f: self._on_done(f, submitted_at))
+        return future
+
+    # 等待任务结果，超时抛出 TimeoutError，子进程崩溃时退回当前进程渲染，其余异常原样抛出
+    def _wait_result(self, future: Future | None, table_name: str, record: Any, file_path: str | None) -> bytes | str:
+        if future is None:
+            return self._render_in_process(table_name, record, file_path)
+        try:
+            return future.result(timeout=self.task_timeout)
+        except FutureTimeoutError:
+            # 只能取消尚未开始的任务；已在执行的任务会继续运行到结束，之后才释放排队名额
+            future.cancel()
+            raise TimeoutError(f"报表渲染超时（{self.task_timeout}s）: {getattr(record, 'batch_number', '')}")
+        except BrokenProcessPool as e:
+            print(f"报表子进程异常退出，改为当前进程渲染: {e}")
+            self._reset_executor()
+            self.fallback_count += 1
+            return self._render_in_process(table_name, record, file_path)
+
+    # 渲染单个报表，返回 xlsx 字节串或文件路径
+    def render(self, table_name: str, record: Any, file_path: str | None = None) -> bytes | str:
+        return self._wait_result(self.submit(table_name, record, file_path), table_name, record, file_path)
+
+    # 取一个任务的结果；传入 failed 时单个报表失败（超时、渲染异常）只记录下来，不中断整批渲染
+    def _collect(self, entry: tuple[Future | None, str, Any, str | None],
+                 failed: list[tuple[Any, str]] | None) -> bytes | str | None:
+        future, table_name, record, file_path = entry
+        try:
+            return self._wait_result(future, table_name, record, file_path)
+        except Exception as e:
+            if failed is None:
+                raise
+            self.failed_count += 1
+            failed.append((record, f"{type(e).__name__}: {e}"))
+            return None
+
+    def render_many(self, items: Iterable[tuple[str, Any]], output_dir: str | Path | None = None,
+                    file_names: Iterable[str] | None = None,
+                    failed: list[tuple[Any, str]] | None = None) -> Iterator[tuple[Any, bytes | str]]:
+        """
+        并发渲染多个报表，按提交顺序逐个产出 (报表数据, xlsx 字节串或文件路径)
+
+        同时在途的任务数不超过 max_pending，结果按顺序消费，内存占用与报表总数无关。
+
+        Args:
+            items: (归档表名, 报表数据) 迭代器
+            output_dir: 指定时报表写入该目录，产出文件路径
+            file_names: 与 items 一一对应的文件名，仅 output_dir 指定时使用
+            failed: 传入列表时收集渲染失败的 (报表数据, 失败原因) 并跳过该报表，否则第一个失败直接抛出
+        """
+        names = iter(file_names) if file_names is not None else None
+        window: deque[tuple[Future | None, str, Any, str | None]] = deque()
+        for seq, (table_name, record) in enumerate(items, start=1):
+            file_path = None
+            if output_dir is not None:
+                name = next(names) if names is not None else f"report_{seq}.xlsx"
+                file_path = str(Path(output_dir) / name)
+            # 窗口已满时先产出最早的结果，避免提交阻塞在信号量上
+            if len(window) >= self.max_pending:
+                entry = window.popleft()
+                result = self._collect(entry, failed)
+                if result is not None:
+                    yield entry[2], result
+            window.append((self.submit(table_name, record, file_path), table_name, record, file_path))
+        while window:
+            entry = window.popleft()
+            result = self._collect(entry, failed)
+            if result is not None:
+                yield entry[2], result
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True, cancel_futures=True)
+                self._executor = None
+
+
+_service: ReportRenderService | None = None
+_service_lock = threading.Lock()
+
+# 进程级共享的渲染服务
+def get_report_service() -> ReportRenderService:
+    global _service
+    with _service_lock:
+        if _service is None:
+            _service = ReportRenderService()
+            atexit.register(_service.shutdown)
+        return _service
@@ -0,0 +1,75 @@
+from openpyxl import Workbook
+from openpyxl.styles import Font, Alignment, Border, Side, PatternFill, NamedStyle
+from datetime import date, time
+from functools import lru_cache
+from typing import Any
+
+# 日期时间单元格的数字格式
+DATETIME_FORMAT = 'yyyy-mm-dd hh:mm:ss'
+
+
+class ReportStyleRegistry:
+    """
+    报表命名样式注册表
+
+    样式组件（字体、边框、对齐、填充）在进程内只创建一次，每个工作簿只注册一次命名样式，
+    单元格按名称引用样式，避免 openpyxl 对每个单元格的样式组件重复去重。
+    """
+    def __init__(self, font_name: str = '宋体', color: str = '000000', prefix: str = 'report'):
+        self.font_name = font_name
+        self.color = color
+        self.prefix = prefix
+        side = Side(style='thin', color=color)
+        self.border = Border(left=side, right=side, top=side, bottom=side)
+        self.center_align = Alignment(horizontal='center', vertical='center')
+        self._specs: dict[str, dict] = {}
+        # 标题样式
+        self.title = self.add_style('title', font=Font(name=font_name, size=18, bold=True, color=color))
+        # 表头及小标题样式
+        header_font = Font(name=font_name, size=11, bold=True, color=color)
+        self.header = self.add_style('header', font=header_font)
+        # 数据样式
+        data_font = Font(name=font_name, size=11, bold=False, color=color)
+        self.data = self.add_style('data', font=data_font)
+        # 应用命名样式会把单元格的数字格式重置为 General，日期时间值改用带日期格式的同名样式
+        self._datetime_styles = {
+            self.header: self.add_style('header_datetime', font=header_font, number_format=DATETIME_FORMAT),
+            self.data: self.add_style('data_datetime', font=data_font, number_format=DATETIME_FORMAT),
+        }
+
+    # 登记新样式，未指定的组件使用默认的细边框、居中对齐、无填充，返回样式名
+    def add_style(self, name: str, font: Font, fill: PatternFill | None = None,
+                  border: Border | None = None, alignment: Alignment | None = None,
+                  number_format: str | None = None) -> str:
+        style_name = f"{self.prefix}_{name}"
+        self._specs[style_name] = {
+            'font': font,
+            'fill': fill if fill is not None else PatternFill(fill_type=None),
+            'border': border if border is not None else self.border,
+            'alignment': alignment if alignment is not None else self.center_align,
+        }
+        if number_format is not None:
+            self._specs[style_name]['number_format'] = number_format
+        return style_name
+
+    # 按单元格的值选择样式，日期时间值返回对应的日期样式
+    def style_for(self, style_name: str, value: Any) -> str:
+        if isinstance(value, (date, time)):
+            return self._datetime_styles.get(style_name, style_name)
+        return style_name
+
+    def get_spec(self, style_name: str) -> dict:
+        return self._specs[style_name]
+
+    # 把全部命名样式注册到工作簿，已存在的跳过
+    def register(self, workbook: Workbook) -> None:
+        existing = set(workbook.named_styles)
+        for style_name, spec in self._specs.items():
+            if style_name not in existing:
+                workbook.add_named_style(NamedStyle(name=style_name, **spec))
+
+
+# 进程级样式缓存，相同字体和颜色共用一个注册表
+@lru_cache(maxsize=None)
+def get_style_registry(font_name: str = '宋体', color: str = '000000', prefix: str = 'report') -> ReportStyleRegistry:
+    return ReportStyleRegistry(font_name, color, prefix)
@@ -0,0 +1,389 @@
+from dataclasses import dataclass, field, fields
+from pathlib import Path
+from openpyxl import load_workbook
+from openpyxl.utils.cell import range_boundaries, column_index_from_string
+from openpyxl.styles import Font, Alignment, Border, Side, PatternFill
+from typing import Callable
+import xml.etree.ElementTree as ET
+import hashlib
+import threading
+import re
+
+from report_layout import LITERAL, classify_cell_value
+from report_styles import ReportStyleRegistry
+
+
+# 各归档表对应的报表模板文件
+TEMPLATE_DIR = Path(__file__).parent / "Report_Template"
+TEMPLATE_FILE_MAPPING: dict[str, Path] = {
+    't_tq_batch_archive': TEMPLATE_DIR / "Report_Template.xml",
+}
+BLOCK_NAME_PATTERN = re.compile(r'block_(\d+)')
+
+
+@dataclass(frozen=True, slots=True)
+class TemplateCell:
+    row: int                # 行号，从 1 开始
+    col: int                # 列号，从 1 开始
+    value: str | None
+    style: str | None       # TemplateGrid.styles 中的样式键
+
+@dataclass(slots=True)
+class TemplateGrid:
+    """
+    模板文件解析后的紧凑单元格表，与模板文件格式无关
+    """
+    cells: list[TemplateCell] = field(default_factory=list)
+    merges: list[tuple[int, int, int, int]] = field(default_factory=list)   # (起始行, 起始列, 结束行, 结束列)
+    column_widths: dict[int, float] = field(default_factory=dict)           # 列号 -> 宽度（字符数）
+    row_heights: dict[int, float] = field(default_factory=dict)             # 行号 -> 高度（磅）
+    styles: dict[str, dict] = field(default_factory=dict)                   # 样式键 -> font/fill/border/alignment/number_format
+    blocks: list[tuple[int, int, int, int]] = field(default_factory=list)   # 按 block_N 排序的区块，为空时整张表为一个区块
+
+
+@dataclass(frozen=True, slots=True)
+class TemplateCellPlacement:
+    row: int                # 区块内行号，从 0 开始
+    col: int                # 列号，从 1 开始
+    kind: int               # report_layout 中的 LITERAL / FIELD / DYNAMIC / FORMAT
+    value: str
+    style: str | None       # 命名样式名
+
+@dataclass(frozen=True, slots=True)
+class TemplateBlock:
+    row_count: int
+    cells: tuple[TemplateCellPlacement, ...]
+    merges: tuple[tuple[int, int, int, int], ...]   # 区块内相对行号（从 0 开始）
+    row_heights: tuple[tuple[int, float], ...]
+
+@dataclass(frozen=True, slots=True)
+class TemplatePlan:
+    source: str
+    blocks: tuple[TemplateBlock, ...]
+    column_widths: tuple[tuple[int, float], ...]
+    styles: ReportStyleRegistry
+    fingerprint: str
+
+
+# ---------- xlsx 模板解析 ----------
+
+def _ordered_blocks(wb, ws) -> list[tuple[int, int, int, int]]:
+    """
+    按 block_N 的序号取出模板区块，只保留位于模板工作表上的定义名称
+    """
+    named = []
+    for name, defined in (*wb.defined_names.items(), *ws.defined_names.items()):
+        match = BLOCK_NAME_PATTERN.fullmatch(name)
+        if match is None:
+            continue
+        for sheet_title, coord in defined.destinations:
+            if sheet_title != ws.title:
+                continue
+            min_col, min_row, max_col, max_row = range_boundaries(coord.replace('$', ''))
+            named.append((int(match.group(1)), (min_row, min_col, max_row, max_col)))
+    return [bounds for _, bounds in sorted(named)]
+
+def load_xlsx_template(path: str | Path) -> TemplateGrid:
+    """
+    解析 xlsx 报表模板：单元格值、样式、合并单元格、行高列宽以及 block_N 区块
+    """
+    wb = load_workbook(path)
+    ws = wb.active
+    if ws is None:
+        raise ValueError(f"模板文件没有工作表: {path}")
+    grid = TemplateGrid(blocks=_ordered_blocks(wb, ws))
+    style_keys: dict[int, str] = {}
+    for row in ws.iter_rows():
+        for cell in row:
+            if cell.value is None and not cell.has_style:
+                continue
+            style_key = None
+            if cell.has_style:
+                style_key = style_keys.get(cell.style_id)
+                if style_key is None:
+                    style_key = str(len(style_keys))
+                    style_keys[cell.style_id] = style_key
+                    grid.styles[style_key] = {
+                        'font': cell.font.copy(),
+                        'fill': cell.fill.copy(),
+                        'border': cell.border.copy(),
+                        'alignment': cell.alignment.copy(),
+                        'number_format': cell.number_format,
+                    }
+            value = None if cell.value is None else str(cell.value)
+            grid.cells.append(TemplateCell(cell.row, cell.column, value, style_key))
+    for merged in ws.merged_cells.ranges:
+        min_col, min_row, max_col, max_row = merged.bounds
+        grid.merges.append((min_row, min_col, max_row, max_col))
+    for letter, dimension in ws.column_dimensions.items():
+        if dimension.customWidth and dimension.width:
+            first = dimension.min or column_index_from_string(letter)
+            for col in range(first, (dimension.max or first) + 1):
+                grid.column_widths[col] = dimension.width
+    for row_idx, dimension in ws.row_dimensions.items():
+        if dimension.height:
+            grid.row_heights[row_idx] = dimension.height
+    wb.close()
+    return grid
+
+# ---------- SpreadsheetML（Excel 2003 XML）模板解析 ----------
+
+SS_NS = '{urn:schemas-microsoft-com:office:spreadsheet}'
+R1C1_PATTERN = re.compile(r"=?(?:'?([^'!=]+)'?!)?R(\d+)C(\d+)(?::R(\d+)C(\d+))?")
+BORDER_STYLES = {('Continuous', '1'): 'thin', ('Continuous', '2'): 'medium', ('Continuous', '3'): 'thick',
+                 ('Dash', '1'): 'dashed', ('Dot', '1'): 'dotted', ('Double', '3'): 'double'}
+BORDER_SIDES = {'Left': 'left', 'Right': 'right', 'Top': 'top', 'Bottom': 'bottom'}
+_WORKSHEET, _TABLE, _COLUMN, _ROW, _CELL, _DATA, _STYLE, _NAMED_RANGE = (
+    f'{SS_NS}{tag}' for tag in ('Worksheet', 'Table', 'Column', 'Row', 'Cell', 'Data', 'Style', 'NamedRange')
+)
+
+
+def _ss(elem: ET.Element, name: str, default: str | None = None) -> str | None:
+    return elem.get(f'{SS_NS}{name}', default)
+
+def _local(tag: str) -> str:
+    return tag.rsplit('}', 1)[-1]
+
+# SpreadsheetML 的列宽单位为磅，换算为 Excel 字符宽度
+def _points_to_chars(points: float) -> float:
+    return round(max(points * 4 / 3 - 5, 0) / 7, 2)
+
+def _xml_color(value: str | None) -> str | None:
+    return value.lstrip('#').upper() if value else None
+
+def _parse_xml_style(style: ET.Element) -> dict:
+    """
+    把 <Style> 元素转换为 openpyxl 样式组件
+    """
+    spec: dict = {}
+    for child in style:
+        tag = _local(child.tag)
+        if tag == 'Font':
+            spec['font'] = Font(
+                name=_ss(child, 'FontName'),
+                size=float(_ss(child, 'Size', '11')),
+                bold=_ss(child, 'Bold') == '1',
+                italic=_ss(child, 'Italic') == '1',
+                color=_xml_color(_ss(child, 'Color')),
+            )
+        elif tag == 'Alignment':
+            horizontal = _ss(child, 'Horizontal')
+            vertical = _ss(child, 'Vertical')
+            spec['alignment'] = Alignment(
+                horizontal=horizontal.lower() if horizontal and horizontal != 'Automatic' else None,
+                vertical=vertical.lower() if vertical and vertical != 'Automatic' else None,
+                wrap_text=_ss(child, 'WrapText') == '1',
+            )
+        elif tag == 'Borders':
+            sides = {}
+            for border in child:
+                side_name = BORDER_SIDES.get(_ss(border, 'Position', ''))
+                if side_name is None:
+                    continue
+                line = BORDER_STYLES.get((_ss(border, 'LineStyle', ''), _ss(border, 'Weight', '1')), 'thin')
+                sides[side_name] = Side(style=line, color=_xml_color(_ss(border, 'Color')))
+            spec['border'] = Border(**sides)
+        elif tag == 'Interior':
+            color = _xml_color(_ss(child, 'Color'))
+            if color and _ss(child, 'Pattern', 'Solid') != 'None':
+                spec['fill'] = PatternFill(fill_type='solid', start_color=color, end_color=color)
+        elif tag == 'NumberFormat':
+            number_format = _ss(child, 'Format')
+            if number_format:
+                spec['number_format'] = number_format
+    spec.setdefault('font', Font())
+    spec.setdefault('fill', PatternFill(fill_type=None))
+    spec.setdefault('border', Border())
+    spec.setdefault('alignment', Alignment())
+    return spec
+
+def _parse_named_range(name: str, refers_to: str | None, sheet_title: str | None) -> tuple[int, tuple] | None:
+    match = BLOCK_NAME_PATTERN.fullmatch(name or '')
+    ref = R1C1_PATTERN.search(refers_to or '')
+    if match is None or ref is None:
+        return None
+    if ref.group(1) and sheet_title and ref.group(1) != sheet_title:
+        return None
+    r0, c0 = int(ref.group(2)), int(ref.group(3))
+    r1, c1 = (int(ref.group(4)), int(ref.group(5))) if ref.group(4) else (r0, c0)
+    return int(match.group(1)), (r0, c0, r1, c1)
+
+def load_xml_template(path: str | Path) -> TemplateGrid:
+    """
+    流式解析 SpreadsheetML 报表模板，产出与 xlsx 模板相同的单元格表
+
+    使用 iterparse 逐个处理 Row/Cell 元素，处理完立即清除，内存占用与模板行数无关；
+    只读取第一张工作表，读完即停止解析。
+    """
+    grid = TemplateGrid()
+    named: list[tuple[int, tuple]] = []
+    pending_names: list[tuple[str, str | None]] = []
+    sheet_title = None
+    table = None
+    row_idx = 0
+    col_idx = 0
+    column_idx = 0
+    for event, elem in ET.iterparse(path, events=('start', 'end')):
+        tag = elem.tag
+        if event == 'start':
+            if tag == _WORKSHEET:
+                sheet_title = _ss(elem, 'Name')
+            elif tag == _TABLE and sheet_title is not None:
+                table = elem
+            elif tag == _ROW and table is not None:
+                index = _ss(elem, 'Index')
+                row_idx = int(index) if index else row_idx + 1
+                col_idx = 0
+                height = _ss(elem, 'Height')
+                if height:
+                    grid.row_heights[row_idx] = float(height)
+        elif tag == _CELL and table is not None:
+            index = _ss(elem, 'Index')
+            col_idx = int(index) if index else col_idx + 1
+            data = elem.find(_DATA)
+            value = ''.join(data.itertext()) if data is not None else None
+            style_id = _ss(elem, 'StyleID')
+            grid.cells.append(TemplateCell(row_idx, col_idx, value, style_id if style_id in grid.styles else None))
+            across = int(_ss(elem, 'MergeAcross', '0'))
+            down = int(_ss(elem, 'MergeDown', '0'))
+            if across or down:
+                grid.merges.append((row_idx, col_idx, row_idx + down, col_idx + across))
+                # SpreadsheetML 只写出合并区域左上角的单元格，其余单元格补上相同样式，边框才完整
+                style = grid.cells[-1].style
+                if style is not None:
+                    grid.cells.extend(
+                        TemplateCell(r, c, None, style)
+                        for r in range(row_idx, row_idx + down + 1)
+                        for c in range(col_idx, col_idx + across + 1)
+                        if (r, c) != (row_idx, col_idx)
+                    )
+            col_idx += across
+        elif tag == _ROW and table is not None:
+            # 已处理的行从 Table 下移除，保持内存占用恒定
+            table.clear()
+        elif tag == _COLUMN and table is not None:
+            index = _ss(elem, 'Index')
+            column_idx = int(index) if index else column_idx + 1
+            span = int(_ss(elem, 'Span', '0'))
+            width = _ss(elem, 'Width')
+            if width:
+                for col in range(column_idx, column_idx + span + 1):
+                    grid.column_widths[col] = _points_to_chars(float(width))
+            column_idx += span
+        elif tag == _STYLE and sheet_title is None:
+            style_id = _ss(elem, 'ID')
+            if style_id and style_id != 'Default':
+                grid.styles[style_id] = _parse_xml_style(elem)
+            elem.clear()
+        elif tag == _NAMED_RANGE:
+            pending_names.append((_ss(elem, 'Name'), _ss(elem, 'RefersTo')))
+        elif tag == _WORKSHEET:
+            break
+    for name, refers_to in pending_names:
+        parsed = _parse_named_range(name, refers_to, sheet_title)
+        if parsed is not None:
+            named.append(parsed)
+    grid.blocks = [bounds for _, bounds in sorted(named)]
+    return grid
+
+# 按文件后缀选择解析器
+TEMPLATE_LOADERS: dict[str, Callable[[str | Path], TemplateGrid]] = {
+    '.xlsx': load_xlsx_template,
+    '.xml': load_xml_template,
+}
+
+
+# ---------- 编译 ----------
+
+def _grid_fingerprint(grid: TemplateGrid) -> str:
+    digest = hashlib.sha1()
+    for cell in grid.cells:
+        digest.update(f"{cell.row},{cell.col},{cell.value},{cell.style};".encode('utf-8'))
+    for key, spec in sorted(grid.styles.items()):
+        digest.update(f"{key}:{sorted((k, repr(v)) for k, v in spec.items())};".encode('utf-8'))
+    digest.update(repr((grid.merges, sorted(grid.column_widths.items()),
+                        sorted(grid.row_heights.items()), grid.blocks)).encode('utf-8'))
+    return digest.hexdigest()
+
+def compile_template_plan(grid: TemplateGrid, record_class: type, source: str = '') -> TemplatePlan:
+    """
+    将模板单元格表编译为按区块组织的放置计划，模板样式克隆为命名样式
+
+    取值规则与 report_layout 相同：字段名按字段取值，动态值在生成时计算，含 {字段名} 的字符串按格式化填充。
+    """
+    fingerprint = _grid_fingerprint(grid)
+    registry = ReportStyleRegistry(prefix=f"tpl_{fingerprint[:8]}")
+    style_names = {
+        key: registry.add_style(key, spec['font'], spec['fill'], spec['border'], spec['alignment'], spec.get('number_format'))
+        for key, spec in grid.styles.items()
+    }
+    record_fields = {f.name for f in fields(record_class)}
+
+    bounds_list = grid.blocks
+    if not bounds_list and grid.cells:
+        bounds_list = [(
+            min(c.row for c in grid.cells), min(c.col for c in grid.cells),
+            max(c.row for c in grid.cells), max(c.col for c in grid.cells),
+        )]
+    blocks = []
+    for min_row, min_col, max_row, max_col in bounds_list:
+        cells = []
+        for cell in grid.cells:
+            if min_row <= cell.row <= max_row and min_col <= cell.col <= max_col:
+                value = cell.value if cell.value is not None else ''
+                kind = classify_cell_value(value, record_fields) if value else LITERAL
+                cells.append(TemplateCellPlacement(cell.row - min_row, cell.col, kind, value, style_names.get(cell.style)))
+        merges = tuple(
+            (r0 - min_row, c0, r1 - min_row, c1)
+            for r0, c0, r1, c1 in grid.merges
+            if min_row <= r0 and r1 <= max_row and min_col <= c0 and c1 <= max_col
+        )
+        row_heights = tuple(
+            (row - min_row, height) for row, height in sorted(grid.row_heights.items())
+            if min_row <= row <= max_row
+        )
+        blocks.append(TemplateBlock(max_row - min_row + 1, tuple(cells), merges, row_heights))
+    return TemplatePlan(source, tuple(blocks), tuple(sorted(grid.column_widths.items())), registry, fingerprint)
+
+
+# ---------- 计划缓存 ----------
+
+_plans: dict[tuple, tuple[tuple[int, int], TemplatePlan]] = {}
+_lock = threading.Lock()
+
+def get_template_plan(path: str | Path, record_class: type) -> TemplatePlan:
+    """
+    获取模板文件编译好的计划，按文件修改时间和大小判断是否需要重新解析
+
+    每次调用只做一次 stat，模板解析只发生在首次使用或文件被修改之后。
+    """
+    path = Path(path).resolve()
+    loader = TEMPLATE_LOADERS.get(path.suffix.lower())
+    if loader is None:
+        raise ValueError(f"不支持的模板文件类型: {path.suffix}")
+    try:
+        stat = path.stat()
+    except OSError:
+        raise ValueError(f"模板文件不存在: {path}")
+    version = (stat.st_mtime_ns, stat.st_size)
+    key = (path, record_class)
+    cached = _plans.get(key)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+    with _lock:
+        cached = _plans.get(key)
+        if cached is None or cached[0] != version:
+            plan = compile_template_plan(loader(path), record_class, str(path))
+            cached = (version, plan)
+            _plans[key] = cached
+    return cached[1]
+
+def get_table_template_plan(table_name: str, record_class: type) -> TemplatePlan:
+    template_path = TEMPLATE_FILE_MAPPING.get(table_name)
+    if template_path is None:
+        raise ValueError(f"不支持的报表类型: {table_name}")
+    return get_template_plan(template_path, record_class)
+
+def invalidate_template_plans() -> None:
+    with _lock:
+        _plans.clear()
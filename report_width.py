@@ -0,0 +1,83 @@
+from functools import lru_cache
+from typing import Any, Iterable
+import re
+
+
+# 东亚宽字符（中日韩文字、全角符号等）区间，每个字符按两个字符宽度计算
+WIDE_CHAR_RANGES: tuple[tuple[int, int], ...] = (
+    (0x1100, 0x115F),   # 谚文字母
+    (0x2E80, 0x303E),   # 中日韩部首、康熙部首、中文标点
+    (0x3041, 0x33FF),   # 日文假名、注音、中日韩兼容字符
+    (0x3400, 0x4DBF),   # 中日韩统一表意文字扩展 A
+    (0x4E00, 0x9FFF),   # 中日韩统一表意文字
+    (0xA000, 0xA4CF),   # 彝文
+    (0xAC00, 0xD7A3),   # 谚文音节
+    (0xF900, 0xFAFF),   # 中日韩兼容表意文字
+    (0xFE30, 0xFE4F),   # 中日韩兼容形式
+    (0xFF00, 0xFF60),   # 全角字符
+    (0xFFE0, 0xFFE6),   # 全角符号
+    (0x20000, 0x2FFFD), # 中日韩统一表意文字扩展 B 及以后
+    (0x30000, 0x3FFFD),
+)
+_WIDE_PATTERN = re.compile('[' + ''.join(f'{chr(start)}-{chr(end)}' for start, end in WIDE_CHAR_RANGES) + ']')
+
+DEFAULT_MIN_WIDTH = 8
+DEFAULT_MAX_WIDTH = 60
+WIDTH_PADDING = 2
+
+
+@lru_cache(maxsize=4096)
+def _text_width(text: str) -> int:
+    if text.isascii():
+        return len(text)
+    return len(text) + len(_WIDE_PATTERN.findall(text))
+
+def display_width(value: Any) -> int:
+    """
+    单元格内容在 Excel 中的显示宽度（字符数），宽字符计为 2
+    """
+    if value is None or value == '':
+        return 0
+    if isinstance(value, str):
+        # 多行文本取最长的一行
+        if '\n' in value:
+            return max(_text_width(line) for line in value.split('\n'))
+        return _text_width(value)
+    return len(str(value))
+
+
+class ColumnWidthTracker:
+    """
+    写入时记录每列最大显示宽度，写完后直接得到列宽，不需要再遍历工作表
+    """
+    __slots__ = ('widths',)
+
+    def __init__(self):
+        self.widths: dict[int, int] = {}
+
+    def update(self, col: int, value: Any) -> None:
+        width = display_width(value)
+        if width > self.widths.get(col, 0):
+            self.widths[col] = width
+
+    # 记录一整行，first_col 为第一个值所在列号
+    def update_row(self, values: Iterable[Any], first_col: int = 1) -> None:
+        widths = self.widths
+        for col, value in enumerate(values, start=first_col):
+            width = display_width(value)
+            if width > widths.get(col, 0):
+                widths[col] = width
+
+    def column_widths(self, column_count: int | None = None, min_width: float = DEFAULT_MIN_WIDTH,
+                      max_width: float = DEFAULT_MAX_WIDTH, padding: float = WIDTH_PADDING) -> dict[int, float]:
+        """
+        计算列宽，返回 {列号: 宽度}
+
+        Args:
+            column_count: 列数，未写入内容的列按最小宽度处理，缺省时只返回有记录的列
+        """
+        columns = range(1, column_count + 1) if column_count else sorted(self.widths)
+        return {
+            col: max(min_width, min(self.widths.get(col, 0) + padding, max_width))
+            for col in columns
+        }
@@ -0,0 +1,198 @@
+from abc import ABC, abstractmethod
+from openpyxl import Workbook
+from openpyxl.utils import get_column_letter
+from io import BytesIO
+from typing import Any, Iterable
+
+from report_styles import ReportStyleRegistry
+from report_width import ColumnWidthTracker
+
+# xlsxwriter 为可选依赖，未安装时只能使用 openpyxl 后端
+try:
+    import xlsxwriter
+except ImportError:
+    xlsxwriter = None
+
+
+class ReportWriter(ABC):
+    """
+    报表写出后端接口
+
+    BaseReport 只通过这几个方法写单元格，行号、列号均从 1 开始，样式为 ReportStyleRegistry 中的样式名。
+    写入普通行时顺带记录每列最大显示宽度，供自动列宽使用；合并单元格跨多列，不参与列宽计算。
+    """
+    name = ''
+
+    def __init__(self, styles: ReportStyleRegistry, sheet_title: str | None = None):
+        self.styles = styles
+        self.sheet_title = sheet_title or 'Sheet'
+        self.width_tracker = ColumnWidthTracker()
+
+    # 从第一列开始写一整行
+    def write_row(self, row: int, values: Iterable[Any], style: str) -> None:
+        values = values if isinstance(values, list) else list(values)
+        self.width_tracker.update_row(values)
+        self._write_row(row, values, style)
+
+    @abstractmethod
+    def _write_row(self, row: int, values: list[Any], style: str) -> None:
+        ...
+
+    # 合并同一行的若干列并写入值，合并区域内所有单元格使用同一样式
+    @abstractmethod
+    def merge_row(self, row: int, first_col: int, last_col: int, value: Any, style: str) -> None:
+        ...
+
+    @abstractmethod
+    def set_column_width(self, col: int, width: float) -> None:
+        ...
+
+    @abstractmethod
+    def save(self) -> bytes:
+        ...
+
+
+class OpenpyxlWriter(ReportWriter):
+    name = 'openpyxl'
+
+    def __init__(self, styles: ReportStyleRegistry, sheet_title: str | None = None):
+        super().__init__(styles, sheet_title)
+        self.workbook = Workbook()
+        styles.register(self.workbook)
+        self.worksheet = self.workbook.active
+        # 这句其实没啥用，主要是为了消除类型注解报错
+        if self.worksheet is None:
+            self.worksheet = self.workbook.create_sheet()
+        if sheet_title:
+            self.worksheet.title = sheet_title
+
+    def _write_row(self, row: int, values: list[Any], style: str) -> None:
+        ws = self.worksheet
+        style_for = self.styles.style_for
+        for col_idx, value in enumerate(values, start=1):
+            cell = ws.cell(row=row, column=col_idx, value=value)
+            cell.style = style_for(style, value)
+
+    def merge_row(self, row: int, first_col: int, last_col: int, value: Any, style: str) -> None:
+        ws = self.worksheet
+        style = self.styles.style_for(style, value)
+        # 先给待合并的每个单元格设置样式，合并后边框才完整
+        for col_idx in range(first_col, last_col + 1):
+            ws.cell(row=row, column=col_idx).style = style
+        if last_col > first_col:
+            ws.merge_cells(start_row=row, end_row=row, start_column=first_col, end_column=last_col)
+        ws.cell(row=row, column=first_col).value = value
+
+    def set_column_width(self, col: int, width: float) -> None:
+        self.worksheet.column_dimensions[get_column_letter(col)].width = width
+
+    def save(self) -> bytes:
+        buffer = BytesIO()
+        self.workbook.save(buffer)
+        return buffer.getvalue()
+
+
+XLSXWRITER_BORDERS = {'hair': 7, 'thin': 1, 'medium': 2, 'dashed': 3, 'dotted': 4, 'thick': 5, 'double': 6}
+
+def _hex_color(color) -> str | None:
+    rgb = getattr(color, 'rgb', None)
+    if not isinstance(rgb, str):
+        return None
+    return f"#{rgb[-6:]}"
+
+def _xlsxwriter_properties(spec: dict) -> dict:
+    """
+    将命名样式的 openpyxl 组件转换为 xlsxwriter 格式属性
+    """
+    font, fill, border, alignment = spec['font'], spec['fill'], spec['border'], spec['alignment']
+    props: dict[str, Any] = {
+        'font_name': font.name,
+        'font_size': font.sz,
+        'bold': bool(font.b),
+        'italic': bool(font.i),
+    }
+    font_color = _hex_color(font.color)
+    if font_color:
+        props['font_color'] = font_color
+    for side_name in ('left', 'right', 'top', 'bottom'):
+        side = getattr(border, side_name)
+        if side is not None and side.style in XLSXWRITER_BORDERS:
+            props[side_name] = XLSXWRITER_BORDERS[side.style]
+            side_color = _hex_color(side.color)
+            if side_color:
+                props[f'{side_name}_color'] = side_color
+    if alignment.horizontal:
+        props['align'] = alignment.horizontal
+    if alignment.vertical:
+        props['valign'] = 'vcenter' if alignment.vertical == 'center' else alignment.vertical
+    if alignment.wrap_text:
+        props['text_wrap'] = True
+    if fill.fill_type == 'solid':
+        props['pattern'] = 1
+        props['bg_color'] = _hex_color(fill.fgColor) or '#FFFFFF'
+    if spec.get('number_format'):
+        props['num_format'] = spec['number_format']
+    return props
+
+
+class XlsxWriterWriter(ReportWriter):
+    """
+    xlsxwriter 后端，直接生成 XML，不构建单元格对象，大批量导出时速度明显快于 openpyxl
+    """
+    name = 'xlsxwriter'
+
+    def __init__(self, styles: ReportStyleRegistry, sheet_title: str | None = None):
+        if xlsxwriter is None:
+            raise ValueError("使用 xlsxwriter 写出后端需要先安装 xlsxwriter")
+        super().__init__(styles, sheet_title)
+        self.buffer = BytesIO()
+        # 与 openpyxl 一致，字符串原样写入，不自动识别公式和链接
+        self.workbook = xlsxwriter.Workbook(self.buffer, {'in_memory': True, 'strings_to_formulas': False, 'strings_to_urls': False})
+        self.worksheet = self.workbook.add_worksheet(self.sheet_title)
+        self._formats: dict[str, Any] = {}
+
+    # 格式对象按样式名在工作簿内只创建一次
+    def _format(self, style: str):
+        fmt = self._formats.get(style)
+        if fmt is None:
+            fmt = self.workbook.add_format(_xlsxwriter_properties(self.styles.get_spec(style)))
+            self._formats[style] = fmt
+        return fmt
+
+    def _write(self, row: int, col: int, value: Any, fmt) -> None:
+        if value is None or value == '':
+            self.worksheet.write_blank(row, col, None, fmt)
+        else:
+            self.worksheet.write(row, col, value, fmt)
+
+    def _write_row(self, row: int, values: list[Any], style: str) -> None:
+        style_for = self.styles.style_for
+        for col_idx, value in enumerate(values):
+            self._write(row - 1, col_idx, value, self._format(style_for(style, value)))
+
+    def merge_row(self, row: int, first_col: int, last_col: int, value: Any, style: str) -> None:
+        fmt = self._format(self.styles.style_for(style, value))
+        if last_col > first_col:
+            self.worksheet.merge_range(row - 1, first_col - 1, row - 1, last_col - 1, value, fmt)
+        else:
+            self._write(row - 1, first_col - 1, value, fmt)
+
+    def set_column_width(self, col: int, width: float) -> None:
+        self.worksheet.set_column(col - 1, col - 1, width)
+
+    def save(self) -> bytes:
+        self.workbook.close()
+        return self.buffer.getvalue()
+
+
+DEFAULT_WRITER = 'openpyxl'
+WRITER_MAPPING: dict[str, type[ReportWriter]] = {
+    'openpyxl': OpenpyxlWriter,
+    'xlsxwriter': XlsxWriterWriter,
+}
+
+def create_report_writer(backend: str | None, styles: ReportStyleRegistry, sheet_title: str | None = None) -> ReportWriter:
+    writer_class = WRITER_MAPPING.get(backend or DEFAULT_WRITER)
+    if writer_class is None:
+        raise ValueError(f"不支持的写出后端: {backend}")
+    return writer_class(styles, sheet_title)
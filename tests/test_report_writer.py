@@ -0,0 +1,52 @@
+from io import BytesIO
+
+import pytest
+from openpyxl import load_workbook
+
+from clean_data import TQReportData
+from report import get_report_from_record
+from report_layout import DYNAMIC_VALUES
+from report_styles import get_style_registry
+from report_writer import ReportWriter
+
+pytest.importorskip('xlsxwriter')
+
+TABLE_NAME = 't_tq_batch_archive'
+
+
+def _record() -> TQReportData:
+    return TQReportData(
+        product_name='黄芪', batch_quantity=500.0, batch_number='P20240101', device_batch_id=1,
+        device_name='1#提取罐', device_id=1,
+        device_batch_start_time='2024-01-01 08:00:00', device_batch_end_time='2024-01-01 12:00:00',
+        p1_up_temp_set=100.0, p1_up_temp_press_set=0.1, p1_hold_temp_set=98.5, p1_hold_temp_press_set=0.08,
+        p1_hold_temp_time_set=60.0, p1_solvent_num_set=3000.0,
+        p1_up_temp_start_time='2024-01-01 08:10:00', p1_up_temp_end_time='2024-01-01 08:50:00',
+        p1_up_temp_min_press=0.01, p1_up_temp_max_press=0.12,
+        p1_hold_temp_start_time='2024-01-01 08:50:00', p1_hold_temp_end_time='2024-01-01 09:50:00',
+        p1_hold_temp_min_press=0.05, p1_hold_temp_max_press=0.09, p1_hold_temp_time=60.0,
+        p1_hold_temp_min_temp=97.2, p1_hold_temp_max_temp=99.1,
+        p1_solvent_num=2995.5, p1_out_num=2500.0,
+        p1_start_time='2024-01-01 08:10:00', p1_end_time='2024-01-01 10:30:00',
+    )
+
+# 只比较单元格值和合并区域，样式和列宽由各后端自行实现
+def _load(content: bytes) -> tuple[list[tuple], list[str]]:
+    ws = load_workbook(BytesIO(content)).active
+    values = [row for row in ws.iter_rows(values_only=True)]
+    merges = sorted(str(r) for r in ws.merged_cells.ranges)
+    return values, merges
+
+
+@pytest.mark.parametrize('baseline', [None, 'openpyxl'])
+def test_xlsxwriter_matches_baseline(baseline):
+    # 固定生成时间，两次生成跨秒时结果仍一致
+    dynamic_values = dict.fromkeys(DYNAMIC_VALUES, '2024-01-02 00:00:00')
+    expected = _load(get_report_from_record(_record(), TABLE_NAME, dynamic_values, backend=baseline))
+    actual = _load(get_report_from_record(_record(), TABLE_NAME, dynamic_values, backend='xlsxwriter'))
+    assert actual[0] == expected[0]
+    assert actual[1] == expected[1]
+
+def test_report_writer_is_abstract():
+    with pytest.raises(TypeError):
+        ReportWriter(get_style_registry())